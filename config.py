@@ -3,11 +3,13 @@ throughout modules in this project:
 - CWD, TMPDIR:  paths to directories
 - StateConfig:  class storing scrape configuration for a single state
 - CONFIG:   dictionary of state_abbrevation:StateConfig_object pairs
+            (built on first access rather than at import)
 - name2abbrev and abbrev2name:  dictionaries to look up state's abbreviation
                                 given its name, and vice versa
 """
 
 import os
+import pickle
 import numpy as np
 import yaml
 import ast
@@ -15,6 +17,7 @@ import re
 import pandas as pd
 import logging
 
+import modules.utils
 from modules.utils import import_yaml, to_bool, lower_and_underscore, get_valid_uri
 
 
@@ -34,9 +37,23 @@ if not os.path.isdir(TMPDIR):
 # =============================================================================
 
 # Import configuration files
-_cfg = import_yaml(os.path.join(CWD, 'config.yml'))
-_df_ids = pd.read_csv(os.path.join(CWD, _cfg['files']['state_ids']))
-_df_cfg = pd.read_csv(os.path.join(CWD, _cfg['files']['scrape_cfg']))
+_cfg_path = os.path.join(CWD, 'config.yml')
+_cfg = import_yaml(_cfg_path)
+_ids_path = os.path.join(CWD, _cfg['files']['state_ids'])
+_scrape_cfg_path = os.path.join(CWD, _cfg['files']['scrape_cfg'])
+_df_ids = pd.read_csv(_ids_path, usecols=['State', 'Abbreviation'], dtype=str)
+
+# Columns of the scrape configuration file used by StateConfig (plus all
+# field name normalization columns, which end in ' Field')
+_SCRAPE_CFG_COLUMNS = ['State', 'Current/Archive', 'Archive URL', 'Format', 'Uses Joblink Interface?']
+
+# Assembled configuration is cached here, along with the modification times of
+# the files it was built from (including this one, which defines StateConfig, and
+# modules/utils.py, whose functions clean the configuration values)
+_CONFIG_CACHE_PATH = os.path.join(TMPDIR, 'config.pkl')
+
+# Suffix marking the field name normalization columns of the scrape configuration
+_FIELD_SUFFIX_RE = re.compile(r'_field$')
 
 
 def _create_config_dict():
@@ -50,29 +67,72 @@ def _create_config_dict():
     """
 
     # Add FPIS state-abbreviation information to configuration files
+    _df_cfg = pd.read_csv(_scrape_cfg_path, dtype=str,
+                          usecols=lambda c: c in _SCRAPE_CFG_COLUMNS or c.endswith(' Field'))
     df = pd.merge(_df_cfg, _df_ids, how='inner', on=['State'])
 
     # Clean and normalize the configuration data
-    df.columns = df.columns.to_series().apply(lower_and_underscore)
-    df.set_index('abbreviation', inplace=True) 
-    df.rename(columns={'state':'state_name'}, inplace=True)
-    df['format'] = df['format'].apply(lower_and_underscore)
-    df['uses_joblink_interface?'] = df['uses_joblink_interface?'].apply(to_bool)
-    df['archive_url'] = df['archive_url'].apply(lambda x: get_valid_uri(x))
+    column_names = {c: lower_and_underscore(c) for c in df.columns}
+    column_names['State'] = 'state_name'
+    df = df.rename(columns=column_names).set_index('abbreviation')
+    df['format'] = _map_unique(df['format'], lower_and_underscore)
+    df['uses_joblink_interface?'] = _map_unique(df['uses_joblink_interface?'], to_bool)
+    df['archive_url'] = _map_unique(df['archive_url'], get_valid_uri)
 
     # Create dictionary of scrape configurations to run
-    configs = {index: StateConfig(row.to_dict()) for index, row in df.iterrows()}
+    configs = {index: StateConfig(row) for index, row in df.to_dict(orient='index').items()}
+
+    return configs
+
+
+def _load_config_dict():
+    """Load configuration dictionary from the cache file if none of the
+    configuration files have changed since it was written; otherwise, create
+    it with _create_config_dict and rewrite the cache file.
+
+    Returns:
+    - configs:  dictionary of StateConfig objects, one for each row in 
+                the scrape_cfg file
+    """
+
+    sources = [_cfg_path, _ids_path, _scrape_cfg_path, os.path.abspath(__file__),
+               os.path.abspath(modules.utils.__file__)]
+    signature = tuple(os.path.getmtime(path) for path in sources)
+
+    try:
+        with open(_CONFIG_CACHE_PATH, 'rb') as f:
+            cached_signature, configs = pickle.load(f)
+        if cached_signature == signature:
+            return configs
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"Could not load cached configuration from {_CONFIG_CACHE_PATH} ({e}); rebuilding it")
+
+    configs = _create_config_dict()
+    try:
+        with open(_CONFIG_CACHE_PATH, 'wb') as f:
+            pickle.dump((signature, configs), f)
+    except OSError as e:
+        logging.warning(f"Could not cache configuration to {_CONFIG_CACHE_PATH}: {e}")
 
     return configs
 
 
+def _map_unique(series, func):
+    """Apply func to a Series, calling it only once per distinct value"""
+
+    cache = {value: func(value) for value in series.unique()}
+    return series.map(cache)
+
+
 # =============================================================================
 # Configuration settings and state lookup dictionaries
 # =============================================================================
 
 # Dictionaries to look up state abbreviation given name and vice versa
-name2abbrev = {row['State']:row['Abbreviation'] for index, row in _df_ids.iterrows()}
-abbrev2name = {row['Abbreviation']:row['State'] for index, row in _df_ids.iterrows()}
+name2abbrev = dict(zip(_df_ids['State'], _df_ids['Abbreviation']))
+abbrev2name = dict(zip(_df_ids['Abbreviation'], _df_ids['State']))
 
 
 class StateConfig():
@@ -104,21 +164,32 @@ class StateConfig():
         self.IS_JOBLINK = row.get('uses_joblink_interface?') # TODO: remove
 
         # Set field name normalization key-value pairs
-        suffix = "_field"
-        self.FIELDS = {(re.sub(suffix, '', key)).upper(): value for key, value in row.items() if key.endswith(suffix)}
+        self.FIELDS = {_FIELD_SUFFIX_RE.sub('', key).upper(): value for key, value in row.items() if _FIELD_SUFFIX_RE.search(key)}
 
     def display(self):
         for key, value in vars(self).items():
             print(f"{key}: {value}")
 
 
-CONFIG  = _create_config_dict()
+_config = None
+
+def __getattr__(name):
+    """Build CONFIG the first time it is accessed (PEP 562), so that modules
+    which only need the directories or state lookups don't pay for it"""
+
+    global _config
+    if name == 'CONFIG':
+        if _config is None:
+            _config = _load_config_dict()
+        return _config
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # =============================================================================
 # When testing configuration import, display results
 # =============================================================================
 if __name__=="__main__":
+    CONFIG = __getattr__('CONFIG')
     print(f"Imported scrape configuration for the following states:\n{CONFIG.keys()}")
     print(f"\nColumns in example state_config:\n{CONFIG['AL'].state_config.keys()}")
     print("\nExample CONFIG entry:")
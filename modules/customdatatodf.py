@@ -13,7 +13,7 @@ function by providing the custom_todf keyword argument.
 import os
 import re
 import logging
-import camelot
+import pdfplumber
 import pandas as pd
 import openpyxl
 import numpy as np
@@ -21,36 +21,61 @@ import bs4
 from datetime import date
 from lxml import etree
 from lxml.etree import XMLSyntaxError
+from selectolax.lexbor import LexborHTMLParser
 from urllib.parse import urljoin
 
 from modules.utils import whitespace_to_singlespace, get_text_of_matching_elements_lxml
 import modules.datatodf as todf
 
 
+# A single HTML parser is reused for every file parsed in this module
+# Saved responses are always UTF-8 (see WARNSpider.save_response_to_file)
+_HTML_PARSER = etree.HTMLParser(encoding='utf-8')
+
+# XPath expressions used in the loops below, compiled once
+_XP_STRING = etree.XPath('string(.)')
+_XP_P = etree.XPath('.//p')
+_XP_HREFS = etree.XPath('.//*/@href')
+_XP_TABLES = etree.XPath('//table')
+_XP_TD = etree.XPath('.//td')
+_XP_TBODY_TR = etree.XPath('.//tbody/tr')
+_XP_HI_CONTENT = etree.XPath('//div[contains(@class,"primary-content")]')
+
+# Field names used in Tennessee's listings, with the labels preceding their values
+_TN_KEYS = ['Date Notice Posted', 'Company', 'County', 'Affected Workers', 'Closure/Layoff Date', 'Notice/Type']
+_TN_LABELS = [(key, f'{key}:') for key in _TN_KEYS]
+
+# Field labels used in Pennsylvania's listings (a tuple, so it can be passed to str.startswith)
+_PA_FIELDS = ('COUNTY', '# AFFECTED', 'EFFECTIVE DATE', 'CLOSURE OR LAYOFF', 'CLOSING OR LAYOFF')
+
+
 def pdf_WV(filepath):
     """Convert PDF tables to DataFrame for West Virginia
 
     Unlike other states, WV's PDF files contain individual tables for each WARN entry.
     This function reads each table, transposes it, and merges rows/columns together
-    where necessary. For example, based on how Camelot parses tables with split cells,
+    where necessary. For example, based on how pdfplumber parses tables with split cells,
     two different locations provided within the same entry would originally appear under
     two different columns, one unnamed; this code appends the value from the unnamed
     column to that of the column to the left.
     """
 
-    kwargs = {'pages': 'all',
-              'flavor': 'lattice',
-              'split_text': True}
-    tables = camelot.read_pdf(filepath, **kwargs)
+    # Use ruling lines to find table cells (like Camelot's 'lattice' flavor),
+    # without rendering each page to an image first
+    table_settings = {'vertical_strategy': 'lines',
+                      'horizontal_strategy': 'lines'}
+    with pdfplumber.open(filepath) as pdf:
+        tables = [table for page in pdf.pages for table in page.extract_tables(table_settings=table_settings)]
 
-    df_all = pd.DataFrame()
+    rows = []
     for i, table in enumerate(tables):
-        df = table.df
+        # Empty cells are returned as None
+        df = pd.DataFrame(table).fillna('')
         df = df.transpose()
 
         n_cols_current = len(df.columns)
         prev_col_name = ''
-        series = pd.Series()
+        row = {}
         for j in range(n_cols_current):
             # Get column names from the first row, then collapse the remaining rows
             # into a single row. Usually there is just one remaining row anyway,
@@ -60,19 +85,19 @@ def pdf_WV(filepath):
             if j == 0 and not current_col_name:
                 # If the notice has been updated, the first column will be unnamed
                 col_name = 'Update Note'
-                series[col_name] = current_col_val.strip()
+                row[col_name] = current_col_val.strip()
                 prev_col_name = col_name
             elif not current_col_name:
                 # If column is otherwise unnamed, append its value to the previous
                 # column and don't update previous column name
-                series[prev_col_name] = series[prev_col_name] + '\n' + current_col_val.strip()
+                row[prev_col_name] = row[prev_col_name] + '\n' + current_col_val.strip()
             else:
-                series[current_col_name] = current_col_val.strip()
+                row[current_col_name] = current_col_val.strip()
                 prev_col_name = current_col_name
 
-        df_all = df_all.append(series, ignore_index=True)
+        rows.append(row)
 
-    return df_all
+    return pd.DataFrame(rows)
 
 
 def html_HI(filepath, format='html'):
@@ -84,105 +109,100 @@ def html_HI(filepath, format='html'):
 
     There are a lot of specific rules to catch/parse everything."""
     
-    df = pd.DataFrame()
-    with open(filepath, 'r') as f:            
-        tree = etree.parse(f, etree.HTMLParser())
-        content = tree.xpath('//div[contains(@class,"primary-content")]')[-1]
-        lines = content.xpath('.//p')
+    rows = []
+    with open(filepath, 'rb') as f:            
+        tree = etree.parse(f, _HTML_PARSER)
+        content = _XP_HI_CONTENT(tree)[-1]
+        lines = _XP_P(content)
         for line in lines:
-            str_list = line.xpath('string(.)').split('–', 1)
+            line_str = _XP_STRING(line)
+            str_list = line_str.split('–', 1)
             if len(str_list) == 2:
                 if len(str_list[-1]) > 100:
                     # Captures 2019 date-company pairs with original notice links
-                    full_str_list = line.xpath('string(.)').split('\n')
-                    hrefs = line.xpath('.//*/@href')
+                    full_str_list = line_str.split('\n')
+                    hrefs = _XP_HREFS(line)
                     for i, item in enumerate(full_str_list):
                         date_str, company_str = item.split('–')
-                        entry = make_HI_Series(date_str, company_str, hrefs[i])
-                        df = df.append(entry, ignore_index=True)
+                        rows.append(make_HI_row(date_str, company_str, hrefs[i]))
                 else:
                     # Captures 2020-onward date-company pairs with original notice links
                     date_str, company_str = str_list
-                    hrefs = line.xpath('.//*/@href')
+                    hrefs = _XP_HREFS(line)
                     if len(hrefs) == 1:
                         href = hrefs[0]
                     else:
                         href = ''
-                    entry = make_HI_Series(date_str, company_str, href)
-                    df = df.append(entry, ignore_index=True)
+                    rows.append(make_HI_row(date_str, company_str, href))
             elif len(str_list) == 1:
                 # Add amended/updated/supplemented notice links or 
                 # other notes to the previous entry
                 note = str_list[0].strip()
-                hrefs = line.xpath('.//*/@href')
+                hrefs = _XP_HREFS(line)
                 if note.startswith('*'):
                     if len(hrefs) > 0:
                         # Add link to updated notice (there may be multiple such updates)
-                        updates_list = df.iloc[-1, df.columns.get_loc('Updated Links')]
-                        df.iloc[-1, df.columns.get_loc('Updated Links')] = updates_list + hrefs
+                        rows[-1]['Updated Links'].extend(hrefs)
                     else:
                         # Add general note
                         # MINOR BUG: this note may not actually correspond to the entry
                         # to which it is attached
-                        notes_list = df.iloc[-1, df.columns.get_loc('Notes')]
-                        if len(notes_list) > 0:
+                        if rows[-1]['Notes']:
                             note = '\t' + note
-                        df.iloc[-1, df.columns.get_loc('Notes')] = notes_list + note
+                        rows[-1]['Notes'] += note
             else:
                 logging.warning("For HI: did not capture following text as part of an entry: {line}")   
-    return df
+    return pd.DataFrame(rows)
 
 
-def html_PA(filepath, format='html'):
+def html_PA(filepath, format='html', save_full_text=False):
     """Convert somewhat-tabular HTML to DataFrame for Pennsylvania
     
     Although the format looks the same across all years when displayed,
     the actual HTML formatting varies enough between years to be a pain.
 
     BUG: Currently this still doesn't quite catch everything!
+
+    Parameters:
+    - save_full_text:   for debugging, also save the full text of each cell
+                        in a 'Full Cell Text' column
     """
 
-    df_all = pd.DataFrame()
+    entries = []
 
-    with open(filepath, 'r') as f:  
-        tree = etree.parse(f, etree.HTMLParser())
-        tables = tree.xpath('//table')
+    with open(filepath, 'rb') as f:  
+        tree = etree.parse(f, _HTML_PARSER)
+        tables = _XP_TABLES(tree)
         if tables:
             for table in tables:
-                rows = table.xpath('.//tbody/tr')
+                rows = _XP_TBODY_TR(table)
                 if len(rows) == 0:
                     logging.error(f"No table rows found; may need to updated xpath selectors or url")
-                    return df_all
+                    return pd.DataFrame(entries)
 
                 for row in rows:
-                    td = row.xpath('.//td')
+                    td = _XP_TD(row)
 
                     for item in td:
-                        lines = item.xpath('string(.)')
+                        lines = _XP_STRING(item)
                         lineContent = lines.strip()
                         if lineContent:
                             # Pop known fields from list of lines and save remaining lines to an extra field
-                            
-                            boldedLines = item.xpath('.//strong/text()')
-                            print(boldedLines)
-
-                            entry = pd.Series()
+                            entry = {}
 
                             # Split by newline
-                            lineStrs = [l.strip() for l in lines.split('\n') if len(l.strip()) > 0]
+                            lineStrs = [s for s in (l.strip() for l in lines.split('\n')) if s]
 
                             # In later years, field don't always get split up properly: fix that
-                            fieldList = ['COUNTY', '# AFFECTED', 'EFFECTIVE DATE', 'CLOSURE OR LAYOFF', 'CLOSING OR LAYOFF']
-                            for field in fieldList:
-                                try:
-                                    updateIndex = [i for (i, l) in enumerate(lineStrs) if field in l][0]
-                                    if not lineStrs[updateIndex].startswith(field):
-                                        fields = lineStrs.pop(updateIndex).split(field)
-                                        fields[-1] = f"{field}{fields[-1]}"
-                                        lineStrs.extend(fields)
-                                except IndexError:
-                                    # Not all fields are included/labeled in all years
-                                    pass
+                            # by splitting each line in place at any field name found after its start
+                            splitLines = []
+                            for line in lineStrs:
+                                start = 0
+                                for index in sorted(i for i in (line.find(f) for f in _PA_FIELDS) if i > 0):
+                                    splitLines.append(line[start:index].strip())
+                                    start = index
+                                splitLines.append(line[start:])
+                            lineStrs = [l for l in splitLines if l]
 
                             # Check if update; remove that line from list
                             if 'UPDATE' in lineStrs[0]:
@@ -194,24 +214,33 @@ def html_PA(filepath, format='html'):
                             else:
                                 entry['Company'] = lineStrs.pop(0) # Assumes company is only one line! Not sure that's always the case
 
-                            # Assign all remaning lines before a named field to "Address" field
-                            
-                            nextIndex = [i for (i, l) in enumerate(lineStrs) if any(l.startswith(field) for field in fieldList)][0]
-                            entry['Address'] = '\n'.join(lineStrs[:nextIndex]).strip()
-                            for i in range(nextIndex):
-                                lineStrs.pop(0)
-
-                            # Get other common fields
-                            for field in fieldList:
-                                try:
-                                    index = [i for (i, x) in enumerate(lineStrs) if field in x][0]
-                                    value = lineStrs.pop(index)
-                                    value = value.replace(f'{field}: ', '')
-                                    value = value.replace(f'LAYOFF', '') # Included due to differences in field names across years
-                                    entry[field] = value
-                                except IndexError:
+                            # In a single pass, assign all remaining lines before a named field
+                            # to "Address", lines starting with a named field to that field, and
+                            # any other lines to the leftover list
+                            addressLines = []
+                            fieldValues = {}
+                            leftoverLines = []
+                            fieldFound = False
+                            for line in lineStrs:
+                                field = next((f for f in _PA_FIELDS if line.startswith(f)), None)
+                                if field is None:
+                                    if fieldFound:
+                                        leftoverLines.append(line)
+                                    else:
+                                        addressLines.append(line)
+                                elif field in fieldValues:
+                                    # Only the first line labelled with a field is used
+                                    fieldFound = True
+                                    leftoverLines.append(line)
+                                else:
                                     # Not all fields are included/labeled in all years
-                                    pass
+                                    fieldFound = True
+                                    value = line.replace(f'{field}: ', '')
+                                    value = value.replace(f'LAYOFF', '') # Included due to differences in field names across years
+                                    fieldValues[field] = value
+                            entry['Address'] = '\n'.join(addressLines).strip()
+                            entry.update(fieldValues)
+                            lineStrs = leftoverLines
 
                             # Get "Reason" field, if provided w/o label
                             if len(lineStrs) > 0:
@@ -227,14 +256,15 @@ def html_PA(filepath, format='html'):
                             entry['Additional Information'] = "\n".join(lineStrs)
 
                             # Save full text to be on the safe side
-                            entry['Full Cell Text'] = lineContent
+                            if save_full_text:
+                                entry['Full Cell Text'] = lineContent
                         
-                            df_all = df_all.append(entry, ignore_index=True)
+                            entries.append(entry)
 
         else:
             logging.error(f"No table found; may need to updated xpath selectors or url")
 
-    return df_all
+    return pd.DataFrame(entries)
 
 
 def html_NJ(filepath, format='html'):
@@ -243,26 +273,30 @@ def html_NJ(filepath, format='html'):
     This format has each row, including column headers, as individual single-row tables.
     This function assumes the first table found contains column headers and the rest
     contain a single entry.
+
+    Only simple traversals are needed here, so the page is parsed with selectolax's
+    (much faster) Lexbor parser rather than lxml.
     """
 
-    df_all = pd.DataFrame()
-    with open(filepath, 'r') as f:  
-        tree = etree.parse(f, etree.HTMLParser())
-        tables = tree.xpath('//table')
+    entries = []
+    with open(filepath, 'r', encoding='utf-8') as f:  
+        tree = LexborHTMLParser(f.read())
+        tables = tree.css('table')
         if tables:
             for i, table in enumerate(tables):
-                rows = table.xpath('.//tr')
+                rows = table.css('tr')
                 if len(rows) != 1:
                     logging.warning("html_NJ assumes each table has exactly one row, which is not the case - may need to update function")
                 if i == 0 and len(rows) > 0:
-                    columns = get_text_of_matching_elements_lxml(rows[0], './/td')
+                    columns = [td.text().strip() for td in rows[0].css('td')]
                 elif len(rows) > 0:
-                    td = get_text_of_matching_elements_lxml(rows[0], './/td')
+                    td = [td.text().strip() for td in rows[0].css('td')]
                     fields = dict(zip(columns, td))
 
-                    df_all = df_all.append(fields, ignore_index=True)
+                    entries.append(fields)
         else:
             logging.error(f"No table found; may need to updated xpath selectors or url")
+    df_all = pd.DataFrame(entries)
 
     # For some years, the table has normal formatting - in this case,
     # use the normal html table code since the above code won't find results.
@@ -274,60 +308,68 @@ def html_NJ(filepath, format='html'):
 
 
 def html_TN(filepath, format='html'):
-    """For Tennessee"""
+    """For Tennessee
+    
+    Only simple traversals are needed here, so the page is parsed with selectolax's
+    (much faster) Lexbor parser rather than lxml.
+    """
 
-    df_all = pd.DataFrame()
+    entries = []
 
-    with open(filepath, 'r') as f:  
-        tree = etree.parse(f, etree.HTMLParser())
-        content = tree.xpath('//div[contains(@class,"tn-rte parbase")]')[1]
-        lines = content.xpath('.//p')
+    with open(filepath, 'r', encoding='utf-8') as f:  
+        tree = LexborHTMLParser(f.read())
+        content = tree.css('div[class*="tn-rte parbase"]')[1]
+        lines = content.css('p')
         for line in lines:
-            str_list = line.xpath('string(.)').split('|')
+            line_str = line.text()
+            str_list = line_str.split('|')
 
             if len(str_list) > 7:
-                str_lists = line.xpath('string(.)').split('\n')
-                hrefs = line.xpath('.//*/@href')
+                # Two entries have ended up in the same paragraph, one per line
+                str_lists = line_str.split('\n')
+                hrefs = [a.attributes['href'] for a in line.css('[href]')]
                 if len(hrefs) != 2:
                     hrefs = ['', '']
-                df_all = df_all.append(make_TN_Series(str_list[0], href[0]), ignore_index=True)
-                df_all = df_all.append(make_TN_Series(str_list[-1], href[-1]), ignore_index=True)
+                entries.append(make_TN_row(str_lists[0].split('|'), hrefs[0]))
+                entries.append(make_TN_row(str_lists[-1].split('|'), hrefs[-1]))
             elif len(str_list) > 1:
-                hrefs = line.xpath('.//*/@href')
+                hrefs = [a.attributes['href'] for a in line.css('[href]')]
                 if len(hrefs) == 1:
                     href = hrefs[0]
                 else:
                     href = ''
-                df_all = df_all.append(make_TN_Series(str_list, href), ignore_index=True)
-    return df_all
+                entries.append(make_TN_row(str_list, href))
+    return pd.DataFrame(entries)
 
 
 # =============================================================================
-# Generate pd.Series for specified state
+# Generate row dictionary for specified state
 # =============================================================================
-def make_TN_Series(str_list, href):
-    """For Tennessee: create Series entry that will become Scrapy Item. """
+def make_TN_row(str_list, href):
+    """For Tennessee: create dictionary entry that will become Scrapy Item. """
 
-    entry = pd.Series()
-    keys = ['Date Notice Posted', 'Company', 'County', 'Affected Workers', 'Closure/Layoff Date', 'Notice/Type']
+    entry = {}
 
-    for key in keys:
-        field = [re.sub(f'{key}:', '', s).strip() for s in str_list if key in s]
-        if len(field) == 0:
-            field = ''
-        else:
-            field = field[0]
-        entry[key] = field
+    # Find the first value for each field in a single pass over the strings,
+    # assuming each string contains at most one labelled field
+    fields = {}
+    for s in str_list:
+        for key, label in _TN_LABELS:
+            if label in s and key not in fields:
+                fields[key] = s.split(label, 1)[1].strip()
+                break
 
-        entry['Notice Link'] = href
+    for key in _TN_KEYS:
+        entry[key] = fields.get(key, '')
+    entry['Notice Link'] = href
 
     return entry
 
 
-def make_HI_Series(date_str, company_str, href_str):
-    """For Hawaii: create Series entry that will become Scrapy Item. """
+def make_HI_row(date_str, company_str, href_str):
+    """For Hawaii: create dictionary entry that will become Scrapy Item. """
 
-    entry = pd.Series()
+    entry = {}
     entry['Date Received'] = date_str.strip()
     entry['Company'] = company_str.strip()
     entry['Notice Link'] = href_str
@@ -337,4 +379,5 @@ def make_HI_Series(date_str, company_str, href_str):
         entry['Notes'] = '(Scraping note: see HI WARN notice website for further information)'
         entry['Company'] = entry['Company'].strip('* ')
 
-    return entry
\ No newline at end of file
+    return entry
+
@@ -4,10 +4,15 @@ pandas DataFrames from tabular HTML, PDF, or Excel files
 Each of these functions is content-agnostic (not specific to parsing WARN archives)!"""
 
 from datetime import date
+import io
 import os
 import re
+import contextlib
 import logging
+import threading
+from types import MappingProxyType
 import camelot
+import pdfplumber
 import pandas as pd
 import openpyxl
 import numpy as np
@@ -16,7 +21,34 @@ from lxml import etree
 from lxml.etree import XMLSyntaxError
 from urllib.parse import urljoin
 
-from modules.utils import whitespace_to_singlespace, get_text_of_matching_elements_lxml, load_xls_as_xlsx
+from modules.utils import whitespace_to_singlespace, load_xls
+
+try:
+    import python_calamine
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = None
+
+try:
+    import pyarrow
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = None
+
+
+# Number of PDF pages for Camelot to read at once
+_PDF_PAGE_CHUNK = 50
+
+# lxml parsers are not thread-safe, so each thread gets its own (see _get_html_parser)
+_HTML_PARSER = threading.local()
+
+# Precompiled XPath expressions for parsing HTML tables
+_XP_STRING = etree.XPath('string(.)')
+_XP_TH = etree.XPath('.//th')
+_XP_BODY_TR = etree.XPath('.//body/tr')
+_XP_TR = etree.XPath('.//tr')
+_XP_TD = etree.XPath('.//td')
+_XP_HREFS = etree.XPath('.//*/@href')
 
 
 # =============================================================================
@@ -29,7 +61,7 @@ def google_sheets(filepath):
 
 
 def excel(filepath, link_col=None, skip_header=None, drop_footer=None,
-          sheets_to_use=None):
+          sheets_to_use=None, sheet_name_col=None, engine=EXCEL_ENGINE):
     """Convert Excel (.xls or .xslx) sheet to DataFrame
     
     By default, iterates through all worksheets in the workbook,
@@ -40,6 +72,9 @@ def excel(filepath, link_col=None, skip_header=None, drop_footer=None,
         skip_header: number of rows before column names to skip, if any
         drop_footer: number of rows before end of table to skip, if any
         ws_subset: list of worksheet names to parse, if not all
+        sheet_name_col: name of a column to add with the name of the sheet each row is from, if any
+        engine: pandas Excel reader to use when not extracting hyperlinks (e.g., 'calamine' or
+                'openpyxl'); by default, calamine if python-calamine is installed, else pandas' default
     """
 
     if skip_header is None:
@@ -47,58 +82,87 @@ def excel(filepath, link_col=None, skip_header=None, drop_footer=None,
     if drop_footer is None:
         drop_footer = 0
 
-    # Load workbook, converting old-style Excel to newer version if necessary
-    if os.path.splitext(filepath)[-1] == '.xls':
-        wb = load_xls_as_xlsx(filepath)
+    if isinstance(link_col, int):
+        link_col = [link_col]
+
+    wb_links = None
+    is_xls = isinstance(filepath, str) and os.path.splitext(filepath)[-1] == '.xls'
+    if is_xls:
+        # Old-style Excel: read the cell values only, with dates as mm/dd/yyyy strings
+        # (hyperlinks are not read from these)
+        xls_sheets = load_xls(filepath)
+        titles = sheets_to_use or list(xls_sheets)
+        sheets = [(title, xls_sheets[title].to_numpy(dtype=object)) for title in titles]
+    elif link_col:
+        # Hyperlinks are only available when the full workbook is loaded (not in
+        # read-only mode): read the cell values from the same workbook
+        wb_links = openpyxl.load_workbook(filepath, data_only=True)
+
+        # Select sheets to parse (all by default, or those specified by sheets_to_use)
+        if sheets_to_use:
+            worksheets = [wb_links[i] for i in sheets_to_use]
+        else:
+            worksheets = wb_links.worksheets
+        sheets = [(ws.title, list(ws.iter_rows(values_only=True))) for ws in worksheets]
     else:
-        wb = openpyxl.load_workbook(filepath)
-    
-    df_all = pd.DataFrame()
+        # Without hyperlinks, let pandas read the cell values directly, using
+        # the compiled calamine reader if available
+        sheets = pd.read_excel(filepath, sheet_name=sheets_to_use or None,
+                               header=None, engine=engine)
+        sheets = [(title, df.to_numpy(dtype=object)) for title, df in sheets.items()]
 
-    # Select sheets to parse (all by default, or those specified by sheets_to_use)
-    if sheets_to_use:
-        worksheets = [wb[i] for i in sheets_to_use]
-    else:
-        worksheets = wb.worksheets
-    for i, ws in enumerate(worksheets):
-        df = pd.DataFrame(ws.values)
+    frames = []
 
-        # Update column names
-        columns = df.iloc[skip_header].to_list()
-        columns = [whitespace_to_singlespace(s) for s in columns]
-        df.columns = columns
+    for title, rows in sheets:
+        n_rows = len(rows)
 
-        # Drop unnecessary rows, including column names
-        header_rows = list(range(0, skip_header + 1))
-        footer_rows = list(range(ws.max_row - drop_footer, ws.max_row))
-        df = df.drop(header_rows + footer_rows, axis=0) 
+        # Get column names, and build DataFrame from the rows between
+        # the column names and the footer, keeping the cell values as they are
+        columns = [None if pd.isna(s) else whitespace_to_singlespace(s) for s in rows[skip_header]]
+        df = pd.DataFrame(rows[skip_header + 1:n_rows - drop_footer], columns=columns, dtype=object)
 
         # Get hidden rows/columns - placeholder
 
         # Get hyperlinks
         if link_col:
-            if isinstance(link_col, int):
-                link_col = [link_col]
+            ws_links = wb_links[title] if wb_links is not None else None
             for col in link_col:
                 # Generate name of new column
                 col_name = columns[col]
                 if not col_name:
                     col_name = col
-                name = col_name + ' Link'
-
-                links = {}
-                for row_index in range(ws.min_row + skip_header, ws.max_row - drop_footer): 
-                    # Get row_index:link pairs where link exists
-                    try:
-                        link = ws.cell(row=row_index, col=col).hyperlink.target
-                        links[row_index] = link
-                    except Exception as e:
-                        logging.warning(f"Expecting column {col} to contain a link, but none found")
-                        links[row_index] = ''    
-                
-                df[name] = pd.Series(links).values
+                name = f'{col_name} Link'
+
+                # Sheet rows and columns are 1-indexed; the first data row
+                # follows the column names
+                if ws_links is None:
+                    links = [''] * len(df)
+                else:
+                    links = [cell.hyperlink.target if cell.hyperlink else ''
+                             for (cell,) in ws_links.iter_rows(min_row=skip_header + 2, max_row=n_rows - drop_footer,
+                                                               min_col=col + 1, max_col=col + 1)]
+
+                # Warn once per column rather than once per row without a link
+                n_missing = links.count('')
+                if n_missing:
+                    logging.warning("Expecting column %s to contain links, but none found in %d of %d rows",
+                                    col, n_missing, len(links))
+
+                df[name] = links
+
+        if sheet_name_col is not None:
+            df[sheet_name_col] = title
 
-        df_all = df_all.append(df)
+        frames.append(df)
+
+    if not frames:
+        df_all = pd.DataFrame()
+    elif all(f.columns.equals(frames[0].columns) for f in frames):
+        # Sheets with identical columns don't need to be aligned; stack them directly
+        df_all = pd.DataFrame(np.vstack([f.values for f in frames]),
+                              columns=frames[0].columns, dtype=object)
+    else:
+        df_all = pd.concat(frames, join='outer', ignore_index=True)
 
     return df_all
 
@@ -127,7 +191,8 @@ def pdf(filepath, header_on_all_pages=True, header_row=0, first_page_header=0, p
               'flavor': 'lattice',
               'split_text': True} # TODO: See if having this one default helps or hurts
     kwargs.update(pdf_kwargs)
-    tables = camelot.read_pdf(filepath, **kwargs)
+    tables = _read_pdf_tables(filepath, **kwargs)
+    is_stream = kwargs['flavor'] == 'stream'
 
     frames = []
     df_all = pd.DataFrame()
@@ -152,7 +217,8 @@ def pdf(filepath, header_on_all_pages=True, header_row=0, first_page_header=0, p
                     column_names_partial = column_name_str.split(col_delimiter)
                     columns[index:index+len(column_names_partial)] = column_names_partial
                 # Remove whitespace and set column number expectation
-                columns = [whitespace_to_singlespace(s) for s in columns]
+                # (camelot cells are always strings, so the vectorized accessor is safe)
+                columns = pd.Index(columns).str.split().str.join(' ').to_list()
                 n_cols_expected = n_cols_current
             else:
                 if n_cols_current == len(column_names):
@@ -164,22 +230,19 @@ def pdf(filepath, header_on_all_pages=True, header_row=0, first_page_header=0, p
 
         # Some PDFs have summary tables at the end or other table-like elements;
         # column number checks are to discard these. (Keep > for 'stream' flavor)
-        if (n_cols_current == n_cols_expected) or (n_cols_current > n_cols_expected and kwargs['flavor'] == 'stream'):
-            if (n_cols_current > n_cols_expected) and (kwargs['flavor'] == 'stream'):
+        if n_cols_current == n_cols_expected or (is_stream and n_cols_current > n_cols_expected):
+            if n_cols_current > n_cols_expected:
                 # Drop columns beyond expected columns for 'stream' flavor
-                while n_cols_current > n_cols_expected:
-                    df.drop(columns=df.columns[-1], axis=1, inplace=True)
-                    n_cols_current = len(df.columns)
+                df = df.iloc[:, :n_cols_expected]
             df.columns = columns
             
             # Drop rows containing column headings
             # TODO: Check that multi-page pdfs have same header on each page to drop!
             if header_on_all_pages or i == 0:
                 if i == 0:
-                    rows_to_drop = list(range(0, header_row + first_page_header + 1))
+                    df = df.iloc[header_row + first_page_header + 1:]
                 else:
-                    rows_to_drop = list(range(0, header_row + 1))
-                df = df.drop(rows_to_drop, axis=0) 
+                    df = df.iloc[header_row + 1:]
 
             frames.append(df)
         else:
@@ -193,13 +256,36 @@ def pdf(filepath, header_on_all_pages=True, header_row=0, first_page_header=0, p
     return df_all
 
 
+def _read_pdf_tables(filepath, pages='all', **kwargs):
+    """Yield tables read by Camelot, reading long PDFs a chunk of pages at a time
+    
+    Camelot keeps an image of each page with every table it returns, which adds up
+    on PDFs with hundreds of pages. Reading in chunks and dropping the images (only
+    used for plotting) lets each chunk be released before the next one is read."""
+
+    if pages != 'all':
+        yield from camelot.read_pdf(filepath, pages=pages, **kwargs)
+        return
+
+    with pdfplumber.open(filepath) as pdf:
+        n_pages = len(pdf.pages)
+
+    for start in range(1, n_pages + 1, _PDF_PAGE_CHUNK):
+        end = min(start + _PDF_PAGE_CHUNK - 1, n_pages)
+        for table in camelot.read_pdf(filepath, pages=f'{start}-{end}', **kwargs):
+            table._image = None
+            yield table
+
+
 def html_pandas(url):   
     """Convert HTML table(s) to DataFrame
     
     If multiple tables are found, they are concatenated into a single DataFrame."""
 
+    # Files saved by the spiders (save_response_to_file) are always UTF-8
+    kwargs = {'encoding': 'utf-8'} if isinstance(url, str) and os.path.isfile(url) else {}
     try:
-        dfs = pd.read_html(url)
+        dfs = pd.read_html(url, **kwargs)
     except (XMLSyntaxError, ValueError) as e:
         logging.error(f"{e}. If directly from URL: check if the URL does in fact have HTML tables - if not, update link and/or format. If from temperary file: check if temporary file has any contents - if not, check for error in save_response_to_file.") 
         return pd.DataFrame()
@@ -217,8 +303,8 @@ def html_pandas(url):
         return pd.DataFrame()
     
 
-def html(filepath, base_url='', use_pandas=False, tag=None, table_class=None, link_col=None,
-         min_num_cols=1, use_unicode=False, drop_first_row=False):
+def html(filepath, base_url='', use_pandas=False, tag=None, table_class=None, table_xpath=None,
+         link_col=None, min_num_cols=1, drop_first_row=False):
     """Convert HTML table(s) to DataFrame
     
     If multiple tables are found, they are concatenated into a single DataFrame.
@@ -231,6 +317,10 @@ def html(filepath, base_url='', use_pandas=False, tag=None, table_class=None, li
     For other projects, if neither of the above points apply, pd.read_html() is
     probably the way to go, especially if you will directly be using the DataFrame
     for data analysis with pandas.
+
+    Only the tables matching table_xpath (if given), or else table_class or tag,
+    are parsed; when the layout of the page is known, a specific table_xpath
+    avoids parsing every table on the page.
     """
 
     # Pandas has a streamlined html table converter that works for many cases;
@@ -238,31 +328,40 @@ def html(filepath, base_url='', use_pandas=False, tag=None, table_class=None, li
     if use_pandas:
         return html_pandas(filepath)
 
-    if table_class is not None:
+    if table_xpath is not None:
+        search_str = table_xpath
+    elif table_class is not None:
         search_str = f'//table[@class="{table_class}"]'
     else:
         if tag is None:
             tag = 'table'
         search_str = f'//{tag}'
 
-    df_all = pd.DataFrame()
+    # Rows are collected as dicts and converted once at the end; keep track of
+    # the columns seen (in order) so they don't need to be inferred from the rows
+    rows_all = []
+    columns_all = {}
 
-    if use_unicode:
-        kwargs = {'encoding': 'utf-8'}
+    if hasattr(filepath, 'read'):
+        # Already a file-like object (e.g., io.BytesIO of a response body)
+        file_context = contextlib.nullcontext(filepath)
+        encoding = None
     else:
-        kwargs = {}
+        # Files saved by the spiders (save_response_to_file) are always UTF-8
+        file_context = open(filepath, 'rb')
+        encoding = 'utf-8'
 
-    with open(filepath, 'r', **kwargs) as f:  
-        tree = etree.parse(f, etree.HTMLParser())
+    with file_context as f:  
+        tree = etree.parse(f, _get_html_parser(encoding))
         tables = tree.xpath(search_str)
         if tables:
             for table in tables:
                 # Get column headers, if specified
-                columns = get_text_of_matching_elements_lxml(table, './/th')
+                columns = _stripped_text(_XP_TH(table))
                 
-                rows = table.xpath('.//body/tr') # TODO: see if just .//tr is sufficient for all
+                rows = _XP_BODY_TR(table) # TODO: see if just .//tr is sufficient for all
                 if len(rows) == 0:
-                    rows = table.xpath('.//tr')
+                    rows = _XP_TR(table)
                     if len(rows) == 0:
                         logging.error(f"No table rows found in this table; may need to updated xpath selectors or url")
                         continue
@@ -272,32 +371,62 @@ def html(filepath, base_url='', use_pandas=False, tag=None, table_class=None, li
 
                 # If there is no th tag, use first row for column names
                 if len(columns) == 0 and len(rows) > 0:
-                    columns = get_text_of_matching_elements_lxml(rows.pop(0), './/td')
+                    columns = _stripped_text(_XP_TD(rows.pop(0)))
+                columns_all.update(dict.fromkeys(columns))
 
                 for row in rows:
                     # Get value for each column
-                    td = get_text_of_matching_elements_lxml(row, './/td')
+                    td = _stripped_text(_XP_TD(row))
                     fields = dict(zip(columns, td))
 
                     # Follow link on each entry to get more detailed information,
                     # updating the original item before yielding it to the pipelines
                     if link_col is not None:
                         #notice_hrefs = row.xpath(f'.//td[{link_col}]/*/@href')
-                        notice_hrefs = row.xpath(f'.//*/@href') #TODO: check that this works for all
+                        notice_hrefs = _XP_HREFS(row) #TODO: check that this works for all
                         if notice_hrefs:
-                            notice_link = urljoin(base_url, notice_hrefs[0])
+                            # Absolute links (the usual case) don't need to be joined with the base url
+                            notice_link = str(notice_hrefs[0])
+                            if not notice_link.startswith(('http://', 'https://')):
+                                notice_link = urljoin(base_url, notice_link)
                             fields.update({'Notice Link': notice_link})
+                            columns_all['Notice Link'] = None
                             if len(notice_hrefs) > 1:
                                 fields.update({'Updated Notices': notice_hrefs[1:]})
+                                columns_all['Updated Notices'] = None
                         else:
                             logging.warning(f"Expecting a link table entry to contain a link; may need to update column")
 
-                    df_all = df_all.append(fields, ignore_index=True)
+                    rows_all.append(fields)
 
         else:
             logging.error(f"No table found; may need to updated xpath selectors or url")
 
-    return df_all
+    return pd.DataFrame.from_records(rows_all, columns=list(columns_all))
+
+
+def html_from_string(html_str, **kwargs):
+    """Convert HTML table(s) in a string (e.g., Selenium's driver.page_source) to DataFrame
+
+    Same as html(), without having to write the string to a file first.
+    """
+
+    return html(io.StringIO(html_str), **kwargs)
+
+def _get_html_parser(encoding=None):
+    """Get the HTML parser for the current thread and encoding, creating it on first use"""
+    parsers = getattr(_HTML_PARSER, 'parsers', None)
+    if parsers is None:
+        parsers = _HTML_PARSER.parsers = {}
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = etree.HTMLParser(encoding=encoding)
+    return parser
+
+
+def _stripped_text(elements):
+    """Get the stripped text content of each of the given lxml elements"""
+    return [_XP_STRING(e).strip() for e in elements]
 
 
 def csv(filepath):
@@ -306,6 +435,14 @@ def csv(filepath):
     Trivial, but included for compatibility with config format lookup.
     """
 
+    if CSV_ENGINE is not None:
+        try:
+            return pd.read_csv(filepath, engine=CSV_ENGINE)
+        except ValueError as e:
+            logging.warning(f"{e}: falling back to the default CSV parser for {filepath}")
+            if hasattr(filepath, 'seek'):
+                filepath.seek(0)
+
     return pd.read_csv(filepath)
 
 # =============================================================================
@@ -314,25 +451,21 @@ def csv(filepath):
 def drop_empty_rows_cols(df):
     """Basic cleaning: remove completely empty rows/columns"""
 
-    # Drop rows and columns if only NaNs
-    df.dropna(axis=0, how='all', inplace=True)
-    df.dropna(axis=1, how='all', inplace=True)
-
-    # Convert remaining NaNs to empty strings and drop rows/cols consisting of only empty strings 
-    df = df.fillna("")
-    df = df.loc[:, df.ne("").any()]
-    df = df[(df.T != "").any()]
+    # Mark cells that are NaN or empty strings, then drop rows/cols consisting only
+    # of these, and convert remaining NaNs to empty strings
+    values = df.to_numpy(dtype=object)
+    empty = pd.isna(values) | (values == "")
+    df = df.iloc[~empty.all(axis=1), ~empty.all(axis=0)].fillna("")
 
     return df
 
 
 def reset_spacing_in_column_names(df):
-    """Basic cleaning: change newlines and tabsl to single space
-    (not yet applied)"""
+    """Basic cleaning: change newlines and tabs in column names to single space
+
+    Only the column index is replaced; the data itself is not copied."""
 
-    # Drop rows and columns if only NaNs
-    columns = df.columns
-    df.columns = [whitespace_to_singlespace(c) for c in columns]
+    df.columns = pd.Index(df.columns.map(str), dtype=object).str.split().str.join(' ')
 
     return df
 
@@ -347,15 +480,13 @@ def get_google_sheets_export_link(url):
     return url   
 
 
-_ext_dict = {'html': '.html',
-             'google_sheets': '.csv',
-             'pdf': '.pdf',
-             'excel': '.xlsx'}
+_ext_dict = MappingProxyType({'html': '.html',
+                              'google_sheets': '.csv',
+                              'pdf': '.pdf',
+                              'excel': '.xlsx'})
 def get_ext(format):
-    ext = _ext_dict.get(format, None)
-    if ext is None:
-        print("Ya done goofed")
-    return ext
-
-    
-    
\ No newline at end of file
+    """Look up the default file extension for a data format"""
+    try:
+        return _ext_dict[format]
+    except KeyError:
+        raise ValueError(f"Unknown format {format!r}; expected one of {list(_ext_dict)}") from None
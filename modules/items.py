@@ -1,6 +1,7 @@
 """Define Scrapy Item corresponding to a single WARN notice entry"""
 
 import scrapy
+from functools import lru_cache
 from scrapy.item import Item
 from scrapy.loader import ItemLoader
 
@@ -61,6 +62,22 @@ def unpack_entry_fields_as_items(item):
     return (rawItem, normItem)
 
 
+@lru_cache(maxsize=None)
+def _get_normalization_names(name_items):
+    """Get original column names to keep and original_name:normalized_name mapping
+    
+    Cached, since each state uses the same names for every row.
+
+    Parameters:
+        name_items: tuple of (normalized_name, original_name) pairs
+    """
+
+    columns_to_keep = [x for (_, x) in name_items if x] # Some columns may not be present
+    name_dict_inverse = {v: k for (k, v) in name_items}
+
+    return columns_to_keep, name_dict_inverse
+
+
 def get_normalized_fields(name_dict, row):
     """Grab and rename columns which are to be normalized across states
     
@@ -72,10 +89,43 @@ def get_normalized_fields(name_dict, row):
         norm_row:   pd.Series containing normalized_name:value fields
     """
 
-    columns_to_keep = [x for x in name_dict.values() if x] # Some columns may not be present
+    columns_to_keep, name_dict_inverse = _get_normalization_names(tuple(name_dict.items()))
     norm_row = row[row.index.intersection(columns_to_keep)]
-    name_dict_inverse = {v: k for (k, v) in name_dict.items()}
     norm_row.rename(index=name_dict_inverse, inplace=True)
 
     return norm_row
+
+
+def get_normalized_fields_dict(name_dict, fields):
+    """Grab and rename fields which are to be normalized across states, from a dict
     
+    Parameters:
+        names:  dictionary of normalized_name:original_name pairs
+        fields: dictionary of original_name:value fields
+
+    Returns:
+        norm_fields:    dictionary of normalized_name:value fields
+    """
+
+    columns_to_keep, name_dict_inverse = _get_normalization_names(tuple(name_dict.items()))
+    norm_fields = {name_dict_inverse[k]: v for (k, v) in fields.items() if k in columns_to_keep}
+
+    return norm_fields
+
+
+def get_normalized_fields_bulk(name_dict, df):
+    """Grab and rename columns which are to be normalized across states, for all rows at once
+    
+    Parameters:
+        names:  dictionary of normalized_name:original_name pairs
+        df:     pd.DataFrame containing original_name columns
+
+    Returns:
+        norm_df:    pd.DataFrame containing normalized_name columns
+    """
+
+    columns_to_keep, name_dict_inverse = _get_normalization_names(tuple(name_dict.items()))
+    norm_df = df[df.columns.intersection(columns_to_keep)]
+    norm_df = norm_df.rename(columns=name_dict_inverse)
+
+    return norm_df
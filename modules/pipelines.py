@@ -1,15 +1,19 @@
 import os
 import scrapy
-from itemadapter import ItemAdapter
-from scrapy.exporters import JsonLinesItemExporter, CsvItemExporter
+import pandas as pd
+from scrapy.exporters import JsonLinesItemExporter
 
 from config import name2abbrev, SAVEDIR
+
+# Buffer size for exported files; larger than the default to reduce the number of writes
+_BUFFER_SIZE = 1024 * 1024
        
         
 class PerStateJsonlinesExportPipeline:
     """Distribute items across multiple JSONL files according to their 'state_name' field"""
 
     def open_spider(self, spider):
+        os.makedirs(SAVEDIR, exist_ok=True)
         self.state_to_exporter = {}
 
     def close_spider(self, spider):
@@ -18,11 +22,10 @@ class PerStateJsonlinesExportPipeline:
             jsonl_file.close()
 
     def _exporter_for_item(self, item):
-        adapter = ItemAdapter(item)
-        state = name2abbrev[adapter['state_name']]
+        state = name2abbrev[item['state_name']]
         if state not in self.state_to_exporter:
             file_path = os.path.join(SAVEDIR, f'{state}_WARN_Notices.jsonl')
-            jsonl_file = open(file_path, 'ab')
+            jsonl_file = open(file_path, 'ab', buffering=_BUFFER_SIZE)
             exporter = JsonLinesItemExporter(jsonl_file, encoding='utf-8')
             exporter.start_exporting()
             self.state_to_exporter[state] = (exporter, jsonl_file)
@@ -34,42 +37,115 @@ class PerStateJsonlinesExportPipeline:
         return item
 
 
+def _append_to_csv(file_path, rows, columns=None):
+    """Append rows (dicts) to a CSV file and return the file's columns
+    
+    columns are the file's current columns, if known; otherwise they are read from its
+    header. If the rows have fields that the file doesn't have columns for yet, the file
+    is rewritten with the union of the columns, so no field is dropped."""
+
+    df = pd.DataFrame(rows, dtype=object)
+    df.columns = df.columns.map(str) # As read back from the CSV header
+
+    # Columns of the existing file, if any (possibly from an earlier run)
+    if columns is None and os.path.exists(file_path):
+        columns = list(pd.read_csv(file_path, nrows=0).columns)
+
+    if columns is None:
+        df.to_csv(file_path, index=False)
+        columns = list(df.columns)
+    elif df.columns.difference(columns).empty:
+        df.reindex(columns=columns).to_csv(file_path, mode='a', index=False, header=False)
+    else:
+        # New fields: rewrite the file with the union of the columns
+        df_old = pd.read_csv(file_path, dtype=object, keep_default_na=False)
+        df = pd.concat([df_old, df], ignore_index=True)
+        df.to_csv(file_path, index=False)
+        columns = list(df.columns)
+    return columns
+
+
 class PerStateCsvExportPipeline:
     """Distribute items across multiple CSV files according to their 'state_name' field
     
     This creates two separate CSV files for each state, one with the raw fields and metadata,
-    the other with only the normalized fields."""
+    the other with only the normalized fields. Items are buffered and written BATCH_SIZE
+    at a time (and when the spider closes); see _append_to_csv for how new fields are
+    handled."""
+
+    BATCH_SIZE = 1000
 
     def open_spider(self, spider):
-        self.state_to_exporter = {}
+        os.makedirs(SAVEDIR, exist_ok=True)
+        self.buffers = {}
+        self.columns = {}
 
     def close_spider(self, spider):
-        for exporter_raw, exporter_norm, csv_file_raw, csv_file_norm in self.state_to_exporter.values():
-            exporter_raw.finish_exporting()
-            exporter_norm.finish_exporting()
-            csv_file_raw.close()
-            csv_file_norm.close()
+        for state in self.buffers:
+            self._flush(state)
 
-    def _exporter_for_item(self, item):
-        adapter = ItemAdapter(item)
-        state = name2abbrev[adapter['state_name']]
-        if state not in self.state_to_exporter:
-            file_path = os.path.join(SAVEDIR, f'{state}_WARN_Notices_raw.csv')
-            file_path = os.path.join(SAVEDIR, f'{state}_WARN_Notices_normalized.csv')
-            csv_file_raw = open(file_path, 'ab')
-            csv_file_norm = open(file_path, 'ab')
-            exporter_raw = CsvItemExporter(csv_file_raw, encoding='utf-8')
-            exporter_norm = CsvItemExporter(csv_file_norm, encoding='utf-8')
-            exporter_raw.start_exporting()
-            exporter_norm.start_exporting()
-            self.state_to_exporter[state] = (exporter, csv_file_norm)
-        return self.state_to_exporter[state][0]
+    def process_item(self, item, spider):
+        state = name2abbrev[item['state_name']]
+        buffer_raw, buffer_norm = self.buffers.setdefault(state, ([], []))
+        buffer_raw.append({'state_name': item['state_name'],
+                           'timestamp': item.get('timestamp'),
+                           'url': item.get('url'),
+                           **(item.get('fields') or {})})
+        buffer_norm.append({'state_name': item['state_name'],
+                            **(item.get('normalized_fields') or {})})
+        if len(buffer_raw) >= self.BATCH_SIZE:
+            self._flush(state)
+        return item
+
+    def _flush(self, state):
+        for rows, kind in zip(self.buffers[state], ('raw', 'normalized')):
+            if not rows:
+                continue
+            file_path = os.path.join(SAVEDIR, f'{state}_WARN_Notices_{kind}.csv')
+            self.columns[file_path] = _append_to_csv(file_path, rows, self.columns.get(file_path))
+        self.buffers[state] = ([], [])
+
+
+class BatchingExporterPipeline:
+    """Collect items per state and append them to CSV files in batches
+    
+    Each state's file has the metadata and raw fields of each item. Rather than writing
+    each item as it arrives, items are buffered and written BATCH_SIZE at a time (and
+    when the spider closes), building a DataFrame once per batch. If a batch has fields
+    that the file doesn't have columns for yet, the file is rewritten with the union of
+    the columns."""
+
+    BATCH_SIZE = 1000
+
+    def open_spider(self, spider):
+        os.makedirs(SAVEDIR, exist_ok=True)
+        self.buffers = {}
+        self.columns = {}
+
+    def close_spider(self, spider):
+        for state in self.buffers:
+            self._flush(state)
 
     def process_item(self, item, spider):
-        exporter = self._exporter_for_item(item)
-        exporter.export_item(item)
+        state = name2abbrev[item['state_name']]
+        buffer = self.buffers.setdefault(state, [])
+        buffer.append({'state_name': item['state_name'],
+                       'timestamp': item.get('timestamp'),
+                       'url': item.get('url'),
+                       **(item.get('fields') or {})})
+        if len(buffer) >= self.BATCH_SIZE:
+            self._flush(state)
         return item
 
+    def _flush(self, state):
+        rows = self.buffers[state]
+        if not rows:
+            return
+
+        file_path = os.path.join(SAVEDIR, f'{state}_WARN_Notices.csv')
+        self.columns[state] = _append_to_csv(file_path, rows, self.columns.get(state))
+        self.buffers[state] = []
+
 
 def import_from_PerStateJsonlinesExportPipeline(filepath):
     """Placeholder for re-loading exported data"""
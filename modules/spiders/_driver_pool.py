@@ -0,0 +1,92 @@
+"""Pool of Selenium webdrivers shared by the spiders that need a browser
+
+Launching Chrome is the slowest part of the Selenium-based spiders, so
+drivers are kept open once created and reused by later requests (and by
+other spiders running in the same process). All drivers are quit when the
+process exits.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+
+
+MAX_DRIVERS = 2
+
+
+class DriverPool(object):
+    """Keep up to max_drivers Selenium webdrivers open for reuse
+
+    Drivers are created lazily by the function given to acquire(). If all of
+    the pooled drivers are in use, an extra driver is created and then quit
+    on release rather than blocking (Scrapy callbacks all run in one thread).
+    """
+
+    def __init__(self, max_drivers=MAX_DRIVERS):
+        self.max_drivers = max_drivers
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def acquire(self, create_driver):
+        """Get an idle driver from the pool, creating one if necessary
+
+        Parameters:
+        - create_driver: function with no arguments returning a new webdriver
+                         (e.g., WARNSpider.initialize_webdriver)
+
+        Returns:
+        - driver: Selenium webdriver, to be given back with release()
+        """
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        driver = create_driver()
+        with self._lock:
+            if len(self._drivers) < self.max_drivers:
+                self._drivers.append(driver)
+            else:
+                logging.info(f"All {self.max_drivers} pooled webdrivers are in use: this one will be quit on release")
+
+        return driver
+
+    def release(self, driver):
+        """Return a driver to the pool, or quit it if it isn't pooled or no longer responds"""
+
+        with self._lock:
+            pooled = any(d is driver for d in self._drivers)
+        if pooled:
+            try:
+                # Leave any frame the spider switched into
+                driver.switch_to.default_content()
+                self._idle.put(driver)
+                return
+            except Exception:
+                logging.warning("Pooled webdriver no longer responds: quitting it")
+                with self._lock:
+                    self._drivers = [d for d in self._drivers if d is not driver]
+        self._quit(driver)
+
+    def quit_all(self):
+        """Quit all pooled drivers"""
+
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        self._idle = queue.Queue()
+        for driver in drivers:
+            self._quit(driver)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception:
+            logging.warning("Could not quit webdriver", exc_info=True)
+
+
+driver_pool = DriverPool()
+atexit.register(driver_pool.quit_all)
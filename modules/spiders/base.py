@@ -7,19 +7,90 @@ the resulting rows as Entry items.
 
 import os
 import re
+import codecs
+import hashlib
+import inspect
+import io
 import pandas as pd
 import logging
 from typing import Iterable
 import scrapy
-from urllib.parse import urljoin, urlparse, urlunparse
-from pathlib import Path
+from urllib.parse import urlencode, urljoin, urlparse, urlunparse
+from pathlib import Path, PurePosixPath
 from datetime import datetime
-from selenium import webdriver
+from lxml import etree
 
 import modules.datatodf as todf
+import modules.customdatatodf as ctodf
+import modules.utils
 from config import CWD, TMPDIR
-from modules.items import Entry, get_normalized_fields
-from modules.utils import get_text_of_matching_elements, is_valid_url, remove_reserved_chars, whitespace_to_singlespace
+from modules.spiders._driver_pool import driver_pool
+from modules.items import Entry, get_normalized_fields_bulk, get_normalized_fields_dict
+from modules.utils import get_text_of_matching_elements_lxml, is_valid_url, remove_reserved_chars
+
+_TMPDIR_PATH = Path(TMPDIR)
+
+# DataFrames parsed from responses, keyed by response content (see get_parse_cache_path),
+# if the WARN_PARSE_CACHE setting is on
+PARSE_CACHE_DIR = os.path.join(TMPDIR, 'parse_cache')
+
+# Most DataFrames kept in PARSE_CACHE_DIR; the least recently written are removed first
+PARSE_CACHE_MAX_FILES = 500
+
+# Modules the parsing functions depend on: editing any of them invalidates the parse cache
+_PARSER_SOURCES = (todf.__file__, ctodf.__file__, modules.utils.__file__)
+
+# Rows written at a time when saving intermediate CSVs for debugging
+_CSV_CHUNKSIZE = 10000
+
+# Search path of JobLink urls, removed to get the base url
+_JOBLINK_SEARCH_RE = re.compile('/search/warn_lookups.*')
+
+# Links whose text contains $t and whose href contains $h (either check is skipped if empty)
+_LINKS_XPATH = '//a[(not($t) or contains(text(), $t)) and (not($h) or contains(@href, $h))]/@href'
+
+# Page number query parameter in urls of paginated results
+_PAGE_PARAM_RE = re.compile(r'[?&]page=(\d+)')
+
+# Ascending/descending markers in JobLink column headers
+_SORT_MARKERS_RE = re.compile('[▲|▼]')
+
+# Precompiled XPath expressions for JobLink results tables and notice pages
+_XP_TH = etree.XPath('.//th')
+_XP_TBODY_TR = etree.XPath('.//tbody/tr')
+_XP_TBODY_TD = etree.XPath('.//tbody/tr/td')
+_XP_ENTRY_HREFS = etree.XPath('.//tbody/tr/td[1]/*/@href')
+_XP_STRING = etree.XPath('string(.)')
+_XP_DT_DD = etree.XPath('//dt | //dd')
+
+# Seconds between checks of a Selenium wait condition
+_WAIT_POLL_FREQUENCY = 0.25
+
+
+def _iter_records(df):
+    """Yield each row of the DataFrame as a {column: value} dict
+
+    Like df.to_dict(orient='records'), but one row at a time
+    """
+
+    columns = list(df.columns)
+    for values in df.itertuples(index=False, name=None):
+        yield dict(zip(columns, values))
+
+
+def _prune_parse_cache(max_files=PARSE_CACHE_MAX_FILES):
+    """Remove the least recently written DataFrames from the parse cache, keeping max_files"""
+
+    try:
+        with os.scandir(PARSE_CACHE_DIR) as entries:
+            files = sorted((e.stat().st_mtime, e.path) for e in entries if e.is_file())
+    except OSError:
+        return
+    for _, path in files[:-max_files]:
+        try:
+            os.remove(path)
+        except OSError:
+            logging.warning(f"Could not remove old parse cache file {path}")
 
 
 class WARNSpider(scrapy.Spider):
@@ -29,8 +100,10 @@ class WARNSpider(scrapy.Spider):
     that are used in most state-specific spiders.
 
     By default, the parse() method tries to parse the response from start_urls 
-    using the method corresponding to the class instance variable data_format
-    with no additional keyword arguments.
+    using the method corresponding to the class instance variable data_format.
+    Child classes that don't need their own parse() can set the class variables
+    link_kwargs (follow and parse links matching these, with parse_links) and/or
+    parse_kwargs (additional keyword arguments for parse_as_df or parse_links).
 
     Additional methods provided:
     - parse_as_df:  optionally specify a parsing format (e.g., 'html') with any
@@ -38,10 +111,16 @@ class WARNSpider(scrapy.Spider):
     - get_links:    find links in response which match search criteria
     - parse_links:  run get_links, then follow each link with the callback parse_as_df,
                     each with any keyword arguments needed
+    - get_items_from_df:    yield an Entry item for each row of a DataFrame
     - initialize_webdriver:     available for child classes when Selenium is necessary 
+    - get_driver:   webdriver shared by all of a spider's callbacks, released when the spider closes
+    - get_wait:     reusable WebDriverWait for a webdriver and timeout
     - save_response_to_file:    called only within parse_as_df (TODO: move out?)
     """
 
+    link_kwargs = None
+    parse_kwargs = {}
+
     def __init__(self, state_config=None, *args, **kwargs):
         super(WARNSpider, self).__init__(*args, **kwargs)
 
@@ -67,11 +146,19 @@ class WARNSpider(scrapy.Spider):
         # For troubleshooting
         self.page_count = 0
 
+        # Selenium webdriver, if needed (see get_driver), and its waits (see get_wait)
+        self._driver = None
+        self._waits = {}
+
     def parse(self, response):
-        """Parse the response as the default data_format.
+        """Parse the response as the default data_format, or follow and parse the
+        links matching link_kwargs if given.
         This method will often be overridden."""
 
-        yield from self.parse_as_df(response)
+        if self.link_kwargs is not None:
+            yield from self.parse_links(response, link_kwargs=self.link_kwargs, **self.parse_kwargs)
+        else:
+            yield from self.parse_as_df(response, **self.parse_kwargs)
 
     def parse_as_df(self, response, parse_as=None, save_to_file=True, next_page_text=None,
                     todf_kwargs={}, custom_todf=None):
@@ -81,6 +168,9 @@ class WARNSpider(scrapy.Spider):
 
         Parameters:
             parse_as: string corresponding to the expected format of the response
+            save_to_file: whether to save the response to a file and parse that; if False,
+                          the parsing function is given an io.BytesIO of the response body
+                          instead (supported by the html, excel, csv and google_sheets formats)
             custom_todf: custom function to return a dataframe from this data
         """
 
@@ -99,8 +189,14 @@ class WARNSpider(scrapy.Spider):
             logging.info(f"Parsing as DataFrame with format {data_format}: {response.url}")
             timestamp = datetime.now()
 
+            # Reuse the DataFrame parsed from an identical response, if any
             csv_path = None
-            if save_to_file:
+            cache_path = self.get_parse_cache_path(response, data_format, to_df, todf_kwargs)
+            cached = cache_path is not None and os.path.exists(cache_path)
+            if cached:
+                logging.info(f"Using DataFrame previously parsed from identical response: {cache_path}")
+                df = pd.read_pickle(cache_path)
+            elif save_to_file:
                 # Save response to file
                 response_path = self.save_response_to_file(response,
                     annotation=f'_{timestamp.strftime("%Y%m%d%H%M%S")}_',
@@ -110,14 +206,18 @@ class WARNSpider(scrapy.Spider):
                 df = to_df(response_path, **todf_kwargs)
 
                 # For debugging: save intermediate file
-                csv_path = os.path.splitext(response_path)[0] + "_parsed.csv"
-                df.to_csv(csv_path)
+                csv_path = self.save_intermediate_csv(df, os.path.splitext(response_path)[0] + "_parsed.csv")
             else:
-                # Parse tabular data directly from url (will generate new request)
-                df = to_df(response.url, **todf_kwargs)                
+                # Parse tabular data directly from the response body
+                df = to_df(io.BytesIO(response.body), **todf_kwargs)
+
+            if cache_path is not None and not cached:
+                os.makedirs(PARSE_CACHE_DIR, exist_ok=True)
+                df.to_pickle(cache_path)
+                _prune_parse_cache()
 
             # Replace newlines/tabs/etc with singlespace in column names
-            df.columns = df.columns.to_series().apply(whitespace_to_singlespace)
+            df = todf.reset_spacing_in_column_names(df)
 
             # Apply state-specific cleaning function, if defined in child class
             clean = getattr(self, 'clean_df', None)
@@ -126,36 +226,149 @@ class WARNSpider(scrapy.Spider):
 
                 # For debugging:
                 if save_to_file and csv_path:
-                    clean_path = os.path.splitext(csv_path)[0] + "_cleaned.csv"
-                    df.to_csv(clean_path)
+                    self.save_intermediate_csv(df, os.path.splitext(csv_path)[0] + "_cleaned.csv")
 
             # Drop any remaining empty rows or columns
             df = todf.drop_empty_rows_cols(df)
 
             # Create Items and yield to pipelines
-            for index, row in df.iterrows():
-                fields = row.to_dict()
-                norm_fields = get_normalized_fields(self.fields_dict, row).to_dict()
-                item = Entry(state_name=self.state_name,
-                             timestamp=timestamp,
-                             url=response.url,
-                             fields=fields,
-                             normalized_fields=norm_fields)
-                yield item
+            yield from self.get_items_from_df(df, response.url, timestamp)
 
         # Parse multiple HTML pages, if expected
         if next_page_text and data_format == 'html':           
-            next_link = response.xpath(f'//*[@href][text()[contains(., "{next_page_text}")]]/@href').get()
+            next_link = response.xpath('//*[@href][text()[contains(., $t)]]/@href', t=next_page_text).get()
             
             if next_link is not None:
-                logging.info("Parsing next page of results")
-                self.page_count += 1
-                yield response.follow(next_link, self.parse_as_df, cb_kwargs={'parse_as':parse_as, 'save_to_file':save_to_file, 'next_page_text':next_page_text, 'todf_kwargs':todf_kwargs})
+                cb_kwargs = {'parse_as':parse_as, 'save_to_file':save_to_file, 'next_page_text':next_page_text,
+                             'todf_kwargs':todf_kwargs, 'custom_todf':custom_todf}
+                page_links = self.get_remaining_page_links(response, next_link)
+                if page_links:
+                    # Request all pages listed in the pager at once. Only the last of them follows
+                    # its next link, in case the pager doesn't list every page
+                    logging.info(f"Parsing {len(page_links)} more pages of results")
+                    self.page_count += len(page_links)
+                    yield from response.follow_all(page_links[:-1], self.parse_as_df,
+                                                   cb_kwargs={**cb_kwargs, 'next_page_text': None})
+                    yield response.follow(page_links[-1], self.parse_as_df, cb_kwargs=cb_kwargs)
+                else:
+                    logging.info("Parsing next page of results")
+                    self.page_count += 1
+                    yield response.follow(next_link, self.parse_as_df, cb_kwargs=cb_kwargs)
             else:
                 logging.info(f"Downloaded {self.page_count} pages of results for {self.state_name}")
 
+    def save_intermediate_csv(self, df, csv_path, force=False):
+        """For debugging: save a parsed DataFrame as CSV, if the WARN_SAVE_INTERMEDIATE setting is on
+
+        Parameters:
+            force: save the CSV regardless of the setting (e.g., when items couldn't be made from it)
+
+        Returns:
+            csv_path if the file was saved, else None
+        """
+
+        if not (force or self.settings.getbool('WARN_SAVE_INTERMEDIATE')):
+            return None
+
+        df.to_csv(csv_path, index=False, chunksize=_CSV_CHUNKSIZE)
+        return csv_path
+
+    def save_intermediate_html(self, html_str, html_path):
+        """For debugging: save a page's HTML, if the WARN_SAVE_INTERMEDIATE setting is on
+
+        Returns:
+            html_path if the file was saved, else None
+        """
+
+        if not self.settings.getbool('WARN_SAVE_INTERMEDIATE'):
+            return None
+
+        with open(html_path, "w", encoding='utf-8') as f:
+            f.write(html_str)
+        return html_path
+
+    def get_items_from_df(self, df, url, timestamp):
+        """Yield an Entry item for each row of the DataFrame
+
+        Fields are normalized for all rows at once, rather than row by row.
+
+        Parameters:
+            url: url the data was scraped from
+            timestamp: time the data was scraped
+        """
+
+        norm_df = get_normalized_fields_bulk(self.fields_dict, df)
+        # (there are no records at all for a frame without columns)
+        if len(norm_df.columns):
+            norm_records = _iter_records(norm_df)
+        else:
+            norm_records = ({} for _ in range(len(df)))
+        for fields, norm_fields in zip(_iter_records(df), norm_records):
+            item = Entry(state_name=self.state_name,
+                         timestamp=timestamp,
+                         url=url,
+                         fields=fields,
+                         normalized_fields=norm_fields)
+            yield item
+
+    def get_remaining_page_links(self, response, next_link):
+        """Get links to the next page of results and the pages after it listed in the pager, if possible
+
+        This works when the page number is part of the url (e.g., '?page=2'). Pagers
+        often only list some of the pages (e.g., 1-10 and "Next"), so the last page
+        returned may not be the last page of results: keep following the next link
+        from it.
+
+        Parameters:
+            next_link: href of the link to the next page
+
+        Returns:
+            page_links: list of hrefs from the next page to the last page listed, or None
+        """
+
+        match = _PAGE_PARAM_RE.search(next_link)
+        if not match:
+            return None
+
+        next_page = int(match.group(1))
+        last_page = max((int(m.group(1)) for m in map(_PAGE_PARAM_RE.search, response.xpath('//a/@href').getall()) if m),
+                        default=next_page)
+        if last_page <= next_page:
+            return None
+
+        start, end = match.span(1)
+        return [f'{next_link[:start]}{n}{next_link[end:]}' for n in range(next_page, last_page + 1)]
+
+    def get_parse_cache_path(self, response, data_format, to_df, todf_kwargs):
+        """Get path at which the DataFrame parsed from this response is cached.
+
+        The key covers the response body, the parsing function (including when its
+        source file and the parsing modules it depends on were last modified) and its
+        keyword arguments, so changes to any of these lead to the response being
+        parsed again.
+
+        Returns:
+            path to pickled DataFrame, or None if the WARN_PARSE_CACHE setting is off
+            or the parsing function's source file can't be found (e.g., a functools.partial)
+        """
+
+        if not self.settings.getbool('WARN_PARSE_CACHE'):
+            return None
+
+        try:
+            sources = {inspect.getsourcefile(to_df), *_PARSER_SOURCES}
+            source_mtimes = sorted((path, os.path.getmtime(path)) for path in sources)
+        except (TypeError, OSError):
+            return None
+
+        key = hashlib.sha256(response.body)
+        key.update(repr((data_format, to_df.__qualname__, source_mtimes,
+                         sorted(todf_kwargs.items()))).encode())
+
+        return os.path.join(PARSE_CACHE_DIR, f'{key.hexdigest()}.pkl')
+
     def save_response_to_file(self, response, format=None, annotation=''):
-        """Save response to text file with appropriate extension.
+        """Save response to file with appropriate extension.
         
         Although Scrapy will ignore SSL certificate verification errors,
         some of the libraries used to parse data from a URL will not. To avoid
@@ -178,8 +391,10 @@ class WARNSpider(scrapy.Spider):
 
         # Build filename, choosing extension carefully
         url = response.url
-        _name, _ext = os.path.splitext(url.split('/')[-1])
-        name = remove_reserved_chars(_name)
+        parsed_url = urlparse(url)
+        url_path = PurePosixPath(parsed_url.path)
+        _ext = url_path.suffix
+        name = remove_reserved_chars(url_path.stem + parsed_url.query) # Query distinguishes e.g. pages of results
         if format in ['html', 'pdf']:
             # HTML files might originally have no extension;
             # PDF files may have a non-PDF extension but PDFMiner requires them to have a .pdf extension
@@ -190,25 +405,23 @@ class WARNSpider(scrapy.Spider):
             if _ext == '':
                 # Look up extension from dictionary. Note that Google Sheets are assumed to be exported as CSV files.
                 ext = todf.get_ext(format)
-                logging.warning("No extension in original url for {format} data: using expected extension {ext}")
+                logging.warning(f"No extension in original url for {format} data: using expected extension {ext}")
             else:
-                ext = _ext.split('?')[0] # Remove query portion of URL, if any     
+                ext = _ext
         file_name = f"{self.state_abbrev}{annotation}{name}{ext}"
 
-        # Save HTML and CSV as text, other formats as binary
-        file_path = os.path.join(TMPDIR, file_name)
+        # Write the response body as is. Text responses that are not already UTF-8
+        # are converted, so that saved HTML and CSV files are always UTF-8.
+        file_path = str(_TMPDIR_PATH / file_name)
+        body = response.body
         if ext == '.html' or ext == '.csv':
-            try:
-                with open(file_path, 'w') as f:
-                    f.write(response.text)
-            except UnicodeEncodeError:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(response.text)
-            except AttributeError as e:
-                logging.error(f"{e}. Check if the format of the content at this URL is html as expected; if not, update the code to specify the correct format (e.g., pdf).")
-        else:
-            with open(file_path, 'wb') as f:
-                f.write(response.body)            
+            encoding = getattr(response, 'encoding', None)
+            if encoding is None:
+                logging.error("Response is not text. Check if the format of the content at this URL is html as expected; if not, update the code to specify the correct format (e.g., pdf).")
+            elif codecs.lookup(encoding).name not in ('utf-8', 'ascii'):
+                body = response.text.encode('utf-8')
+        with open(file_path, 'wb') as f:
+            f.write(body)
 
         return file_path
 
@@ -234,7 +447,7 @@ class WARNSpider(scrapy.Spider):
             if format == 'google_sheets':
                 link = todf.get_google_sheets_export_link(link)
                 logging.info(f"updating link to {link}")
-            yield response.follow(link, callback=self.parse_as_df, cb_kwargs=parse_kwargs)
+            yield response.follow(link, callback=self.parse_as_df, cb_kwargs=parse_kwargs, priority=10)
 
 
     def get_links(self, response, find_in_text=None, find_in_href=None, exclude_from_href=None):
@@ -248,41 +461,37 @@ class WARNSpider(scrapy.Spider):
             exclude_from_href:  string used to discard irrelevant links
 
         Returns:
-            hrefs:  list of hrefs matching search terms. Note that these may be
-                    relative paths (not necessarily complete urls)
+            hrefs:  list of unique hrefs matching search terms, in the order they appear.
+                    Note that these may be relative paths (not necessarily complete urls)
         """        
         
         if not (find_in_text or find_in_href):
             logging.error(f"Supply one or both of find_in_text and find_in_href to search for links in {response.url}")
             return None
 
-        hrefs = []
-        if find_in_text and find_in_href:
-            hrefs = response.xpath(f'//a[contains(text(), "{find_in_text}")][contains(@href, "{find_in_href}")]/@href').getall()
-        elif find_in_text:
-            hrefs = response.xpath(f'//a[contains(text(), "{find_in_text}")]/@href').getall()
-        elif find_in_href:
-            hrefs = response.xpath(f'//a[contains(@href, "{find_in_href}")]/@href').getall()
+        hrefs = response.xpath(_LINKS_XPATH, t=find_in_text or '', h=find_in_href or '').getall()
         
         if len(hrefs) == 0:
             logging.error(f"No links found with text containing {find_in_text} and/or href containing {find_in_href} in {response.url}. Please inspect the HTML element(s) you are hoping to find to check if find_in_href and find_in_text need to be updated.")
             return hrefs
 
-        # Remove duplicates, exclude undesired links, and sort
-        hrefs = list(set(hrefs))
+        # Remove duplicates and exclude undesired links, keeping links in document order
         if exclude_from_href:
-            hrefs = [x for x in hrefs if exclude_from_href not in x]
-        hrefs.sort()
+            hrefs = [x for x in dict.fromkeys(hrefs) if exclude_from_href not in x]
+        else:
+            hrefs = list(dict.fromkeys(hrefs))
 
         logging.info(f"Found links: {hrefs}")
 
         return hrefs
 
-    def initialize_webdriver(isHeadless=False):
+    def initialize_webdriver(self, isHeadless=True):
         """Initialize a Selenium webdriver to use within parse()
 
         To be used when accessing the archive data requires interacting with dynamic web content.
-        Don't forget driver.close() when you are done using it!
+        Don't forget driver.quit() when you are done using it! Alternatively, get the
+        driver from modules.spiders._driver_pool.driver_pool, which reuses open drivers:
+        driver = driver_pool.acquire(self.initialize_webdriver), then driver_pool.release(driver).
 
         Parameters:
         - isHeadless: boolean for whether the browser runs in the background or as a visible window
@@ -290,9 +499,18 @@ class WARNSpider(scrapy.Spider):
         Returns:
         - driver: Selenium webdriver with downloads redirected to the project's temporary directory
         """
+
+        # Imported here so that spiders that don't use Selenium don't need to load it
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
         
         chromeOptions = webdriver.ChromeOptions()
-        chromeOptions.headless = isHeadless # TODO: figure out why headless=True doesn't actually do anything
+        if isHeadless:
+            # Setting chromeOptions.headless has no effect for newer versions of Chrome
+            chromeOptions.add_argument('--headless=new')
+            chromeOptions.add_argument('--window-size=1920,1080')
+            chromeOptions.add_argument('--disable-gpu')
+            chromeOptions.add_argument('--disable-dev-shm-usage')
         prefs = {'download': {'prompt_for_download': False,
                               'directory_upgrade': True,
                               'default_directory': TMPDIR}
@@ -301,12 +519,57 @@ class WARNSpider(scrapy.Spider):
         webdriverPath = os.path.join(CWD, 'config/chromedriver.exe')
 
         logging.info('Initializing Selenium webdriver for Chrome')
-        driver = webdriver.Chrome(executable_path=webdriverPath, options=chromeOptions)
-        driver.maximize_window()
-        driver.implicitly_wait(5)
+        driver = webdriver.Chrome(service=Service(webdriverPath), options=chromeOptions)
+        if not isHeadless:
+            driver.maximize_window()
+        # No implicit wait: spiders wait explicitly for what they need (mixing the two
+        # compounds the timeouts)
+        driver.implicitly_wait(0)
+
+        # Also allow downloads through the DevTools protocol: headless Chrome ignores the
+        # download preferences above in some versions, and downloads would never arrive
+        # for wait_for_file to see
+        try:
+            driver.execute_cdp_cmd('Page.setDownloadBehavior', {'behavior': 'allow',
+                                                                'downloadPath': TMPDIR})
+        except Exception:
+            logging.warning("Could not set download directory through the DevTools protocol", exc_info=True)
 
         return driver
 
+    def get_driver(self):
+        """Get this spider's Selenium webdriver, taking one from the driver pool the first time
+
+        The same driver is reused by all of the spider's callbacks, and is given back
+        to the pool when the spider closes (see closed()); don't close it yourself.
+        """
+
+        if self._driver is None:
+            self._driver = driver_pool.acquire(self.initialize_webdriver)
+        return self._driver
+
+    def get_wait(self, driver, timeout):
+        """Get a WebDriverWait for the driver, reusing the one made earlier for the same timeout
+
+        Waits poll every _WAIT_POLL_FREQUENCY seconds rather than Selenium's default 0.5s.
+        """
+
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        key = (id(driver), timeout)
+        wait = self._waits.get(key)
+        if wait is None:
+            wait = self._waits[key] = WebDriverWait(driver, timeout, poll_frequency=_WAIT_POLL_FREQUENCY)
+        return wait
+
+    def closed(self, reason):
+        """Release the spider's webdriver, if any (called by Scrapy on spider_closed)"""
+
+        self._waits.clear()
+        if self._driver is not None:
+            driver_pool.release(self._driver)
+            self._driver = None
+
 
 class JobLinkSpider(WARNSpider):
     """Child class for JobLink-based WARN archive databases
@@ -317,53 +580,78 @@ class JobLinkSpider(WARNSpider):
     TODO: update this now that I know how to use Scrapy better
     """
 
+    # All requests go to the same JobLink domain; let AutoThrottle adjust the
+    # delay and concurrency to the server's response times (there is no fixed
+    # DOWNLOAD_DELAY floor: AutoThrottle starts from AUTOTHROTTLE_START_DELAY)
+    custom_settings = {'CONCURRENT_REQUESTS': 32,
+                       'CONCURRENT_REQUESTS_PER_DOMAIN': 16,
+                       'AUTOTHROTTLE_ENABLED': True,
+                       'AUTOTHROTTLE_TARGET_CONCURRENCY': 8.0}
+
     def __init__(self, custom_search={}, *args, **kwargs):
         super(JobLinkSpider, self).__init__(*args, **kwargs)
 
         # Construct new start URL from query string and original URL
         search = {'notice_eq': 'true', # WARN notices only
                   'notice_on_gteq': '1988-08-04', # Start date of search
-                  's': 'notice_on+asc' # Sort by notice date, ascending
+                  's': 'notice_on asc' # Sort by notice date, ascending
                   }
         search.update(custom_search)
-        query_string = ('/search/warn_lookups?commit=Search&utf8=✓&' + 
-                        '&'.join([f"q[{key}]={value}" for key, value in search.items()]))
-        self.base_url = re.sub('/search/warn_lookups.*', '', self.config_url) # Need this for link following
+        query_string = '/search/warn_lookups?' + urlencode({'commit': 'Search', 'utf8': '✓',
+                                                            **{f'q[{key}]': value for key, value in search.items()}})
+        self.base_url = _JOBLINK_SEARCH_RE.sub('', self.config_url) # Need this for link following
         self.start_urls = [urljoin(self.base_url, query_string)]
 
         # For logging
         self.page_count = 1
 
-    def parse(self, response):
+    def parse(self, response, follow_next=True):
         """Scrape all search result pages, follow links to individual WARN
         notice pages, and add those to the Entry item before yielding. 
+
+        Parameters:
+            follow_next: whether to request the following page(s) of results; False
+                         for pages that were all requested at once from the first page
         """
         
         # Get table of data
         table_class = "sortable responsive default"
-        table = response.xpath(f'//*[@class="{table_class}"]')
+        tables = [t.root for t in response.xpath(f'//*[@class="{table_class}"]')]
         
-        if table:
+        if tables:
             # Get column headers, stripping ascending/descending markers
-            columns = get_text_of_matching_elements(table, './/th', re_str='[▲|▼]')
+            columns = [c for t in tables for c in get_text_of_matching_elements_lxml(t, _XP_TH, re_str=_SORT_MARKERS_RE)]
+
+            # Get all cells and entry links of each table at once, grouped by row
+            rows = []
+            cells_by_row = {}
+            href_by_row = {}
+            for t in tables:
+                rows.extend(_XP_TBODY_TR(t))
+                for td in _XP_TBODY_TD(t):
+                    cells_by_row.setdefault(td.getparent(), []).append(_XP_STRING(td).strip())
+                for href in _XP_ENTRY_HREFS(t):
+                    # href -> <a> -> <td> -> <tr>; keep the first link in each row
+                    href_by_row.setdefault(href.getparent().getparent().getparent(), str(href))
 
-            rows = table.xpath('.//tbody/tr')
+            timestamp = datetime.now()
             for row in rows:
                 # Get value for each column
-                td = get_text_of_matching_elements(row, './/td')
+                td = cells_by_row.get(row, [])
                 fields = dict(zip(columns, td))
                 
                 # Create item with data dictionary
                 item = Entry(state_name=self.state_name,
-                             timestamp=datetime.now(),
+                             timestamp=timestamp,
                              fields=fields)
                 
                 # Follow link on each entry to get more detailed information,
                 # updating the original item before yielding it to the pipelines
-                entry_href = row.xpath('td[1]/*/@href').get()
+                entry_href = href_by_row.get(row)
                 if entry_href:
                     entry_link = urljoin(self.base_url, entry_href)
-                    yield scrapy.Request(entry_link, callback=self.parse_details, cb_kwargs={"item": item})
+                    yield scrapy.Request(entry_link, callback=self.parse_details, cb_kwargs={"item": item},
+                                         priority=10)
                 else:
                     logging.warning(f"Expecting a link table entry to contain a link; {self.state_name} may need to update xpath selector. Yielding partial Entry")
                     yield item
@@ -371,12 +659,21 @@ class JobLinkSpider(WARNSpider):
             logging.error(f"No table found for {self.state_name}; may need to updated xpath selector")
             yield
 
-        # Do the same for the next page, if any
+        # Do the same for the next page(s), if any
+        if not follow_next:
+            return
         next_link = response.xpath("//a[contains(@class, 'next_page')]/@href").get()
 
         if next_link is not None:
-            self.page_count += 1
-            yield response.follow(next_link, self.parse)
+            page_links = self.get_remaining_page_links(response, next_link)
+            if page_links:
+                # Only the last listed page follows its next link, in case the pager doesn't list every page
+                self.page_count += len(page_links)
+                yield from response.follow_all(page_links[:-1], self.parse, cb_kwargs={'follow_next': False})
+                yield response.follow(page_links[-1], self.parse)
+            else:
+                self.page_count += 1
+                yield response.follow(next_link, self.parse)
         else:
             logging.info(f"Downloaded {self.page_count} pages of results for {self.state_name}")
 
@@ -398,17 +695,23 @@ class JobLinkSpider(WARNSpider):
 
             fields = item['fields']
             
-            dt = get_text_of_matching_elements(response, '//dt')
-            dd = get_text_of_matching_elements(response, '//dd')
-
-            data = dict(zip(dt, dd))
+            # Pair each term with the description following it, in one pass over the page
+            data = {}
+            term = None
+            for element in _XP_DT_DD(response.selector.root):
+                text = _XP_STRING(element).strip()
+                if element.tag == 'dt':
+                    term = text
+                elif term is not None:
+                    data[term] = text
+                    term = None
             
             # Update fields with additional data
             fields.update(data)
             item['fields'] = fields
 
             # Generate normalized fields
-            norm_fields = get_normalized_fields(self.fields_dict, pd.Series(fields)).to_dict()
+            norm_fields = get_normalized_fields_dict(self.fields_dict, fields)
             item['normalized_fields'] = norm_fields     
 
         yield item
@@ -11,27 +11,71 @@ supply a custom parsing function, etc.
 
 import os
 import re
+import time
 import logging
 import scrapy
-import time
 import pandas as pd
-from urllib.parse import urljoin, urlparse, urlunparse
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import Select, WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
 import modules.datatodf as todf
 import modules.customdatatodf as ctodf
 from config import CWD, TMPDIR
 from modules.spiders.base import WARNSpider, JobLinkSpider
-from modules.items import Entry, get_normalized_fields
-from modules.utils import get_base_url, is_valid_url
+from modules.spiders._driver_pool import driver_pool
+from modules.utils import get_base_url, wait_for_file
+
+_IL_FILE_RE = re.compile(r'IebsLayoffs-Public.*\.xlsx$')
+_MI_YEAR_RE = re.compile(r'warn(\d{4})')
+_MO_YEAR_RE = re.compile(r'20\d\d')
+_NC_2015_TO_2017_RE = re.compile(r'201[5-7]')
+_SC_2010_TO_2012_RE = re.compile(r'201[0-2]')
+
+# Page number cells below Washington's table of notices
+_WA_PAGE_CELLS_XPATH = '//tr[@style="color:#000066;background-color:#E6F2F9;"]//tr/td'
+_WA_NOTICES_TABLE_XPATH = '//table[tbody/tr[@style="color:#000066;background-color:#E6F2F9;"]]'
+
+# Links to MN WARN notice archive PDFs: hrefs containing '.pdf' and any of the terms (case-insensitive)
+_MN_LINK_TERMS = ['mass-layoff', 'plant-closing', 'dislocated-worker', 'warn']
+_MN_LINKS_XPATH = ("//a/@href[contains(., '.pdf') and ("
+                   + " or ".join(f"contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), '{term}')"
+                                 for term in _MN_LINK_TERMS)
+                   + ")]")
+
+# Column name and code legends used by clean_df methods
+# NOTE: The values of the *_COLUMN_NAMES mappings should also match the values in the config file!
+CA_COLUMN_NAMES = MappingProxyType({'Employees': 'No. Of Employees',
+                                    'Layoff/Closure Type': 'Layoff/Closure'})
+DC_COLUMN_NAMES = MappingProxyType({'CodeType': 'Code Type',
+                                    'Number toEmployees Affected': 'Number of Employees Affected',
+                                    'Number to Employees Affected': 'Number of Employees Affected'})
+DC_CODE_TYPE = MappingProxyType({'1': 'Layoff',
+                                 '2': 'Permanent Closure'})
+IN_NOTICE_TYPE = MappingProxyType({'W': 'WARN Notice',
+                                   'CL': 'Closure',
+                                   'LO': 'Layoff',
+                                   'TR': 'Transfer',
+                                   'RH': 'Reduction in Hours',
+                                   'Cond.': 'Conditional'})
+MD_TYPE_CODE = MappingProxyType({'1': 'PLANT CLOSURE',
+                                 '2': 'MASS LAYOFF'})
+MD_LOCAL_AREA_CODE = MappingProxyType({'1': 'A.A. CO.',
+                                       '2': 'BALTO. CO.',
+                                       '3': 'BALTO. CITY',
+                                       '4': 'FREDERICK',
+                                       '5': 'LOWER SHORE',
+                                       '6': 'MID-MD.',
+                                       '7': 'MONTGOMERY',
+                                       '8': 'PRINCE GEORGE\'S',
+                                       '9': 'SOUTHERN MARYLAND',
+                                       '10': 'SUSQUEHANNA',
+                                       '11': 'UPPER SHORE',
+                                       '12': 'WESTERN MARYLAND',
+                                       '13': 'STATEWIDE'})
+MI_INCIDENT_TYPE = MappingProxyType({'1': 'Facility Closure',
+                                     '2': 'Layoff Event'})
 
 
 class ALWARNSpider(WARNSpider):
@@ -41,7 +85,7 @@ class ALWARNSpider(WARNSpider):
     def clean_df(self, df):
         """Screen out spurious rows at bottom of page"""
         df = todf.drop_empty_rows_cols(df)
-        df = df[df['Closing or Layoff'].apply(lambda x: len(str(x))) > 1]
+        df = df[df['Closing or Layoff'].astype(str).str.len() > 1]
         return df
 
 
@@ -85,27 +129,21 @@ class CAWARNSpider(WARNSpider):
 
         # Parse archived WARN reports       
         todf_kwargs = {'header_on_all_pages': False}
-        for link in links: 
-            if '7-1-2020' in link:
-                # One of the pdfs has a low-contrast header row that the parser cannot read:
-                # provide column_names argument just for this one. (Not all pdfs have the same columns)
-                additional_kwargs = {'column_names': ["Notice Date", "Effective Date", "Recieved Date", "Company",
-                                                      "City", "County", "No. Of Employees", "Layoff/Closure Type"]}
-                yield response.follow(link, callback=self.parse_as_df,
-                                      cb_kwargs={'parse_as': 'pdf',
-                                                 'todf_kwargs': {**todf_kwargs, **additional_kwargs}})
-            else:
-                yield response.follow(link, callback=self.parse_as_df,
-                                      cb_kwargs={'parse_as': 'pdf', 
-                                                 'todf_kwargs': todf_kwargs})
+        # One of the pdfs has a low-contrast header row that the parser cannot read:
+        # provide column_names argument just for this one. (Not all pdfs have the same columns)
+        additional_kwargs = {'column_names': ["Notice Date", "Effective Date", "Recieved Date", "Company",
+                                              "City", "County", "No. Of Employees", "Layoff/Closure Type"]}
+        requests = [response.follow(link, callback=self.parse_as_df,
+                                    cb_kwargs={'parse_as': 'pdf',
+                                               'todf_kwargs': {**todf_kwargs, **(additional_kwargs if '7-1-2020' in link else {})}})
+                    for link in archive_links]
+        yield from requests
 
     def clean_df(self, df):
         """Normalize column names within the state"""
 
         df = todf.drop_empty_rows_cols(df)
-        column_dict = {'Employees': 'No. Of Employees',
-                       'Layoff/Closure Type': 'Layoff/Closure'}
-        df.rename(columns=column_dict, errors='ignore', inplace=True)
+        df.rename(columns=CA_COLUMN_NAMES, errors='ignore', inplace=True)
 
         return df
 
@@ -114,11 +152,17 @@ class COWARNSpider(WARNSpider):
     """Colorado"""
     name = 'COWARN'
 
-    custom_settings = {'DOWNLOAD_DELAY': 30.0}
+    # One request at a time, at least 30s apart (AutoThrottle never goes below
+    # DOWNLOAD_DELAY), backing off further if the server slows down
+    custom_settings = {'DOWNLOAD_DELAY': 30.0,
+                       'AUTOTHROTTLE_ENABLED': True,
+                       'AUTOTHROTTLE_START_DELAY': 30.0,
+                       'AUTOTHROTTLE_MAX_DELAY': 60.0,
+                       'AUTOTHROTTLE_TARGET_CONCURRENCY': 1.0,
+                       'CONCURRENT_REQUESTS_PER_DOMAIN': 1}
 
-    def parse(self, response):
-        link_kwargs = {'find_in_href': 'docs.google.com/spreadsheets'}
-        yield from self.parse_links(response, link_kwargs=link_kwargs, format='google_sheets') # Need to explicitly provide format, whoops
+    link_kwargs = {'find_in_href': 'docs.google.com/spreadsheets'}
+    parse_kwargs = {'format': 'google_sheets'} # Need to explicitly provide format, whoops
 
 
 class CTWARNSpider(WARNSpider):
@@ -140,23 +184,13 @@ class CTWARNSpider(WARNSpider):
         """Split notice date and received date into two columns"""
 
         df = todf.drop_empty_rows_cols(df)
-        df['WARN Dates'] = df['WARN Date'].apply(self.split_dates)
-        df['Notice Date'] = df['WARN Dates'].apply(lambda x: x[0] if isinstance(x, list) else None)
-        df['Received Date'] = df['WARN Dates'].apply(lambda x: x[1] if isinstance(x, list) else None)
-        df.drop(columns=['WARN Dates'], inplace=True)
+        parts = df['WARN Date'].astype(str).str.split("Rec'd", n=1, expand=True).reindex(columns=[0, 1])
+        is_split = parts[1].notna()
+        df['Notice Date'] = parts[0].str.strip().where(is_split)
+        df['Received Date'] = parts[1].str.strip()
 
         return df
 
-    def split_dates(self, warn_date):
-        """Try to split 'WARN Date' column in two"""
-        
-        dates = warn_date.split('Rec\'d')
-        print(dates)
-        if len(dates) == 2:
-            return [d.strip() for d in dates]
-        else:
-            return warn_date
-
 
 class DEWARNSpider(JobLinkSpider):
     """Delaware"""
@@ -183,31 +217,23 @@ class DCWARNSpider(WARNSpider):
         for link in links:
             yield response.follow(link, callback=self.parse_as_df)
 
-    def clean_df(self, df_raw):
+    def clean_df(self, df):
         """Apply additional cleaning rules
         
         This method, when defined, is run as part of parse_as_df by default.
         """
 
-        df = df_raw.copy(deep=True)
         df = todf.drop_empty_rows_cols(df)
 
         # Drop spurious extra column generated by extra tables on page
         df.drop(columns=0, errors='ignore', inplace=True)
         
         # The column names are slightly different across years: map to same value throughout years
-        # NOTE: The values in the key:value pairs should also match the values in the config file!
-        column_names = {'CodeType': 'Code Type',
-                        'Number toEmployees Affected': 'Number of Employees Affected',
-                        'Number to Employees Affected': 'Number of Employees Affected'}
-
-        df.rename(columns=column_names, errors='ignore', inplace=True)
+        df.rename(columns=DC_COLUMN_NAMES, errors='ignore', inplace=True)
 
         # Apply "Code Type" conversion based on legend, keeping original column also
-        code_type = {'1': 'Layoff',
-                     '2': 'Permanent Closure'}
         df['Code Type (original)'] = df['Code Type']
-        df['Code Type'] = df['Code Type'].apply(lambda x: code_type.get(str(x), x))
+        df['Code Type'] = df['Code Type'].astype(str).map(DC_CODE_TYPE).where(lambda s: s.notna(), df['Code Type'])
 
         return df
 
@@ -237,94 +263,60 @@ class GAWARNSpider(WARNSpider):
     """Georgia"""
     name = 'GAWARN'
 
+    # The Excel download is generated from the search stored in the session
+    custom_settings = {'COOKIES_ENABLED': True}
+
     def __init__(self, *args, **kwargs):
         super(GAWARNSpider, self).__init__(*args, **kwargs)
         self.start_date = '08/04/1988' 
         self.end_date = None
 
     def parse(self, response):
-        """Run Selenium to iterate through years of data
-        
-        Instead of parsing the data from the HTML pages, clicks
-        the "Generate Excel" button and parses that.
+        """Submit the search form for each year of data
+
+        Instead of parsing the data from the HTML pages, submits the
+        "Generate Excel" button on each year's results page and parses that.
         """
 
-        driver = self.initialize_webdriver()
-        driver.get(response.url)
-        
         # Get list of years available
-        yearSelector = Select(driver.find_element_by_name('year'))
-        options = yearSelector.options
-        optionsText = [opt.text for opt in options]
-        optionsText.remove('Select Year')
-
-        files = []
-        for opt in optionsText:
-            # Select "Statewide" data for the current year option
-            geoSelector = Select(driver.find_element_by_name('geoArea'))
-            geoSelector.select_by_visible_text('Statewide')
-            yearSelector = Select(driver.find_element_by_name('year'))
-            yearSelector.select_by_visible_text(opt)
-
-            # Execute search
-            driver.find_element_by_xpath('//button[@value="search"]').click()
-            try:
-                # Check if there is a table of results; if not, exception is raised
-                table = driver.find_element_by_id('emplrList')
-
-                # Click Excel download link
-                driver.find_element_by_xpath('//button[@value="generateExcel"]').click()
-                try:
-                    # Wait for expected filename to appear in directory; 
-                    # if it doesn't appear within 10s, exception is raised
-                    downloadFilename = f'WarnIdList_Statewide_{opt}.xlsx'
-                    downloadFilepath = os.path.join(TMPDIR, downloadFilename)
-                    wait = WebDriverWait(driver, 10)
-                    wait.until(file_exists(downloadFilepath)) 
-
-                    # Rename the file according to convention in WARNSpider save_response_to_file
-                    timestamp = datetime.now()
-                    saveFilename = f'{self.state_abbrev}_{timestamp.strftime("%Y%m%d%H%M%S")}_{downloadFilename}'
-                    saveFilepath = os.path.join(TMPDIR, saveFilename)
-                    os.rename(downloadFilepath, saveFilepath)
-                    files.append(saveFilepath)
-
-                except TimeoutException:
-                    logging.error(f"Expected file to be downloaded from {response.url} with name {downloadFilename}. Check if this filename matches the file produced when manually downloading the file.")
-
-            except NoSuchElementException:
-                # No table element exists if there are no search results present
-                pass
-            driver.find_element_by_link_text('Return to search page').click()
-
-        driver.close()
-
-        # Parse DataFrames for each downloaded file and export Items to pipeline
-        # TODO: un-hardcode-this by splitting the method in WARNSpider into components and using some of those here
-        todf_kwargs = {'skip_header': 5}
-        for f in files:
-            timestamp = f.split('_')[1]
-            df = todf.excel(f, **todf_kwargs)
-            df.to_csv(os.path.splitext(f)[0] + "_parsed.csv")    
-
-            for index, row in df.iterrows():
-                fields = row.to_dict()
-                norm_fields = get_normalized_fields(self.fields_dict, row).to_dict()
-                item = Entry(state_name=self.state_name,
-                             timestamp=timestamp,
-                             url=response.url,
-                             fields=fields,
-                             normalized_fields=norm_fields)
-                yield item
+        geo_area = response.xpath('//select[@name="geoArea"]/option[normalize-space()="Statewide"]/@value').get('Statewide')
+        year_options = response.xpath('//select[@name="year"]/option[normalize-space()!="Select Year"]')
+
+        for option in year_options:
+            year = option.xpath('@value').get() or option.xpath('normalize-space()').get()
+
+            # Search "Statewide" data for the current year; each year gets its own session
+            # so that the Excel download matches the search
+            formdata = {'geoArea': geo_area,
+                        'year': year}
+            yield scrapy.FormRequest.from_response(response, formxpath='//select[@name="year"]/ancestor::form',
+                                                   formdata=formdata, clickdata={'value': 'search'},
+                                                   callback=self.parse_search_results,
+                                                   meta={'cookiejar': year}, cb_kwargs={'year': year})
+
+    def parse_search_results(self, response, year):
+        """Request the Excel download of a year's search results, if there are any"""
+
+        # No table element exists if there are no search results present
+        if not response.xpath('//*[@id="emplrList"]'):
+            logging.info(f"No search results for {year} at {response.url}")
+            return
+
+        cb_kwargs = {'parse_as': 'excel',
+                     'save_to_file': False,
+                     'todf_kwargs': {'skip_header': 5}}
+        yield scrapy.FormRequest.from_response(response, formxpath='//button[@value="generateExcel"]/ancestor::form',
+                                               clickdata={'value': 'generateExcel'},
+                                               callback=self.parse_as_df,
+                                               meta={'cookiejar': response.meta['cookiejar']}, cb_kwargs=cb_kwargs)
 
 
 class HIWARNSpider(WARNSpider):
     """Hawaii"""
     name = 'HIWARN'
 
-    def parse(self, response):
-        """Use state-specific data-to-DataFrame defined in customtodf module"""
-        yield from self.parse_as_df(response, custom_todf=ctodf.html_HI)
+    # Use state-specific data-to-DataFrame defined in customtodf module
+    parse_kwargs = {'custom_todf': ctodf.html_HI}
 
 
 class IDWARNSpider(WARNSpider):
@@ -344,69 +336,63 @@ class ILWARNSpider(WARNSpider):
         """Run Selenium to get all results since start_date
         
         """
-        driver = self.initialize_webdriver()
-        driver.get(response.url)
+        # Imported here so that spiders that don't use Selenium don't need to load it
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import Select
 
-        # Navigate within iframe
-        frame = driver.find_element_by_xpath('//iframe[@title="Page Viewer"]')
-        driver.switch_to.frame(frame)
-
-        #Input date(s) and wait for results to load
-        selector = Select(driver.find_element_by_tag_name('select'))
-        selector.select_by_visible_text('Custom')
-        page_range_locator = (By.XPATH, '//div[@class="pagination-range"]/span')
-        page_range_text = driver.find_element_by_xpath(page_range_locator[1]).text
-        datepickers = driver.find_elements_by_xpath('//input[@ngbdatepicker=""]')
-        datepickers[0].send_keys(self.start_date, Keys.ENTER)
-        wait = WebDriverWait(driver, 30)
-        wait.until(text_has_changed(page_range_locator, page_range_text))
-
-        # Download results once loaded
-        downloadButton = driver.find_element_by_xpath('//*[text()[contains(.,"Download")]]')
-        downloadButton.click()
-
-        saveFilepath = None
+        driver = driver_pool.acquire(self.initialize_webdriver)
         try:
+            driver.get(response.url)
+
+            # Navigate within iframe
+            wait = self.get_wait(driver, 30)
+            wait.until(EC.frame_to_be_available_and_switch_to_it((By.XPATH, '//iframe[@title="Page Viewer"]')))
+
+            #Input date(s) and wait for results to load
+            selector = Select(wait.until(EC.presence_of_element_located((By.TAG_NAME, 'select'))))
+            selector.select_by_visible_text('Custom')
+            page_range_locator = (By.XPATH, '//div[@class="pagination-range"]/span')
+            page_range_text = wait.until(EC.presence_of_element_located(page_range_locator)).text
+            datepickers = wait.until(EC.presence_of_all_elements_located((By.XPATH, '//input[@ngbdatepicker=""]')))
+            datepickers[0].send_keys(self.start_date, Keys.ENTER)
+            wait.until(text_has_changed(page_range_locator, page_range_text))
+
+            # Download results once loaded
+            downloadButton = driver.find_element(By.XPATH, '//*[text()[contains(.,"Download")]]')
+            download_started = time.time()
+            downloadButton.click()
+
+            saveFilepath = None
             # Find downloaded file
-            r = re.compile('IebsLayoffs-Public.*.xlsx')
-            wait = WebDriverWait(driver, 120) 
-            # 07/27/21: Currently this is raising a TimeoutException, and no file has been downloaded.
+            # 07/27/21: Currently this is timing out, and no file has been downloaded.
             # Probably need to add back in the results-loading wait before clicking download, and then
             # maybe further increasing this wait...
-            downloadFilename = wait.until(matching_file_in_directory(r, directory=TMPDIR))
-            downloadFilepath = os.path.join(TMPDIR, downloadFilename)
-
-            # Rename the file
-            timestamp = datetime.now()
-            saveFilename = f'{self.state_abbrev}_{timestamp.strftime("%Y%m%d%H%M%S")}_{downloadFilename}'
-            saveFilepath = os.path.join(TMPDIR, saveFilename)
-            os.rename(downloadFilepath, saveFilepath)
-        except IndexError:
-            logging.warning(f"Expected file to be downloaded from {response.url}")
+            downloadFilename = wait_for_file(TMPDIR, _IL_FILE_RE, timeout=120, since=download_started)
+            if downloadFilename is None:
+                logging.warning(f"Expected file to be downloaded from {response.url}")
+            else:
+                downloadFilepath = os.path.join(TMPDIR, downloadFilename)
 
-        driver.close()
+                # Rename the file
+                timestamp = datetime.now()
+                saveFilename = f'{self.state_abbrev}_{timestamp.strftime("%Y%m%d%H%M%S")}_{downloadFilename}'
+                saveFilepath = os.path.join(TMPDIR, saveFilename)
+                os.rename(downloadFilepath, saveFilepath)
+        finally:
+            driver_pool.release(driver)
 
         # Parse DataFrames for each downloaded file and export Items to pipeline
         # TODO: un-hardcode-this by splitting the method in WARNSpider into components and using some of those here
         if saveFilepath:
             sheet_names = ['Layoffs', 'Scheduled Layoffs']
-            df_original = todf.excel(saveFilepath, sheets_to_use=[sheet_names[0]])
-            df_updates = todf.excel(saveFilepath, sheets_to_use=[sheet_names[1]])
-            df_original.to_csv(os.path.splitext(saveFilepath)[0] + "_layoffs_parsed.csv")
-            df_updates.to_csv(os.path.splitext(saveFilepath)[0] + "_scheduled_parsed.csv")
+            # Parse both sheets from one load of the workbook, recording which sheet each notice came from
+            df = todf.excel(saveFilepath, sheets_to_use=sheet_names, sheet_name_col='Excel Sheet Name')
+            self.save_intermediate_csv(df, os.path.splitext(saveFilepath)[0] + "_parsed.csv")
 
             # TODO: merge original and updates?? Ask Gio
-            for i, df in enumerate([df_original, df_updates]):
-                for index, row in df.iterrows():
-                    fields = row.to_dict()
-                    fields['Excel Sheet Name': sheet_names[i]]
-                    norm_fields = get_normalized_fields(self.fields_dict, row).to_dict()
-                    item = Entry(state_name=self.state_name,
-                                timestamp=timestamp,
-                                url=response.url,
-                                fields=fields,
-                                normalized_fields=norm_fields)
-                    yield item
+            yield from self.get_items_from_df(df, response.url, timestamp)
 
 
 class INWARNSpider(WARNSpider):
@@ -426,14 +412,8 @@ class INWARNSpider(WARNSpider):
     def clean_df(self, df):
         """Apply legend to notice type"""
 
-        notice_type = {'W': 'WARN Notice',
-                       'CL': 'Closure',
-                       'LO': 'Layoff',
-                       'TR': 'Transfer',
-                       'RH': 'Reduction in Hours',
-                       'Cond.': 'Conditional'}
         df['Notice Type (original)'] = df['Notice Type']
-        df['Notice Type'] = df['Notice Type'].apply(lambda x: notice_type.get(str(x), x))
+        df['Notice Type'] = df['Notice Type'].astype(str).map(IN_NOTICE_TYPE).where(lambda s: s.notna(), df['Notice Type'])
         
         return df
 
@@ -442,9 +422,7 @@ class IAWARNSpider(WARNSpider):
     """Iowa"""
     name = 'IAWARN'
 
-    def parse(self, response):
-        link_kwargs = {'find_in_href': '.xlsx'}
-        yield from self.parse_links(response, link_kwargs=link_kwargs)    
+    link_kwargs = {'find_in_href': '.xlsx'}
 
 
 class KSWARNSpider(JobLinkSpider):
@@ -456,19 +434,15 @@ class KYWARNSpider(WARNSpider):
     """Kentucky"""
     name = 'KYWARN'
 
-    def parse(self, response):
-        link_kwargs = {'find_in_href': '.xlsx'}
-        yield from self.parse_links(response, link_kwargs=link_kwargs) 
+    link_kwargs = {'find_in_href': '.xlsx'}
 
 
 class LAWARNSpider(WARNSpider):
     """Louisiana"""
     name = 'LAWARN'
 
-    def parse(self, response):
-        link_kwargs = {'find_in_text': 'WARN Notices',
-                       'find_in_href': '.pdf'}
-        yield from self.parse_links(response,  link_kwargs=link_kwargs)  
+    link_kwargs = {'find_in_text': 'WARN Notices',
+                   'find_in_href': '.pdf'}
 
 
 class MEWARNSpider(JobLinkSpider):
@@ -480,37 +454,20 @@ class MDWARNSpider(WARNSpider):
     """Maryland"""
     name = 'MDWARN'
 
-    def parse(self, response):
-        link_kwargs = {'find_in_href': 'warn',
-                       'exclude_from_href': 'dashboard'}
-        todf_kwargs = {'use_pandas': False}
-        yield from self.parse_links(response, link_kwargs=link_kwargs, todf_kwargs=todf_kwargs)  
+    link_kwargs = {'find_in_href': 'warn',
+                   'exclude_from_href': 'dashboard'}
+    parse_kwargs = {'todf_kwargs': {'use_pandas': False}}
 
     def clean_df(self, df):
         """Use legends provided on state website to convert values"""
 
         # Apply "Type Code" conversion based on legend, keeping original column also
-        type_code = {'1': 'PLANT CLOSURE',
-                     '2': 'MASS LAYOFF'}
         df['Type Code (original)'] = df['Type Code']
-        df['Type Code'] = df['Type Code'].apply(lambda x: type_code.get(str(x), x))
+        df['Type Code'] = df['Type Code'].astype(str).map(MD_TYPE_CODE).where(lambda s: s.notna(), df['Type Code'])
 
         # Apply "Local Area Code" conversion based on legend, keeping original column also
-        local_area_code = {'1': 'A.A. CO.',
-                           '2': 'BALTO. CO.',
-                           '3': 'BALTO. CITY',
-                           '4': 'FREDERICK',
-                           '5': 'LOWER SHORE',
-                           '6': 'MID-MD.',
-                           '7': 'MONTGOMERY',
-                           '8': 'PRINCE GEORGE\'S',
-                           '9': 'SOUTHERN MARYLAND',
-                           '10': 'SUSQUEHANNA',
-                           '11': 'UPPER SHORE',
-                           '12': 'WESTERN MARYLAND',
-                           '13': 'STATEWIDE'}
         df['WIA Code (original)'] = df['WIA Code']
-        df['WIA Code'] = df['WIA Code'].apply(lambda x: local_area_code.get(str(x), x))
+        df['WIA Code'] = df['WIA Code'].astype(str).map(MD_LOCAL_AREA_CODE).where(lambda s: s.notna(), df['WIA Code'])
 
         return df
 
@@ -524,6 +481,19 @@ class MIWARNSpider(WARNSpider):
     """Michigan"""
     name = 'MIWARN'
 
+    # Parsing parameters for the archived PDF of each year
+    PARAMS_BY_YEAR = [([2008, 2013],
+                       {}),
+                      ([2001],
+                       {'pdf_kwargs': {'flavor': 'stream', 'columns': ['101,234,313,367,413']}}),
+                      ([2004, 2011, 2012, 2014],
+                       {'first_page_header': 1}),
+                      ([2000, 2002, 2003],
+                       {'first_page_header': 2}),
+                      ([2005, 2006, 2007, 2009, 2010, 2015],
+                       {'first_page_header': 3})]
+    KWARGS_BY_YEAR = {year: kwargs for years, kwargs in PARAMS_BY_YEAR for year in years}
+
     def parse(self, response):
         # Parse landing page (HTML)
         yield from self.parse_as_df(response, parse_as='html')
@@ -540,32 +510,20 @@ class MIWARNSpider(WARNSpider):
         links = self.get_links(response, find_in_href='pdf', exclude_from_href='Statewide')
         todf_kwargs = {'pdf_kwargs': {'flavor': 'stream'},
                        'header_on_all_pages': False}
-        params_by_year = {0: ([2008, 2013],
-                              {}),
-                          10: ([2001],
-                              {'pdf_kwargs': {'flavor': 'stream', 'columns': ['101,234,313,367,413']}}),
-                          1: ([2004, 2011, 2012, 2014],
-                              {'first_page_header': 1}),
-                          2: ([2000, 2002, 2003],
-                              {'first_page_header': 2}),
-                          3: ([2005, 2006, 2007, 2009, 2010, 2015],
-                              {'first_page_header': 3})}
         
-        # Apply appropriate parsing parameters to each year
+        # Apply appropriate parsing parameters to each year (links for other years are skipped)
         for link in links:
-            for key in params_by_year.keys():
-                years, kwargs = params_by_year[key]
-                if any([f'warn{year}' in link for year in years]):
-                    cb_kwargs = {'parse_as': 'pdf',
-                                 'todf_kwargs': {**todf_kwargs, **kwargs}}
-                    yield response.follow(link, callback=self.parse_as_df, cb_kwargs=cb_kwargs)
+            match = _MI_YEAR_RE.search(link)
+            kwargs = self.KWARGS_BY_YEAR.get(int(match.group(1))) if match else None
+            if kwargs is not None:
+                cb_kwargs = {'parse_as': 'pdf',
+                             'todf_kwargs': {**todf_kwargs, **kwargs}}
+                yield response.follow(link, callback=self.parse_as_df, cb_kwargs=cb_kwargs)
 
     def clean_df(self, df):
         # Apply "Incident Type" conversion based on legend, keeping original column also
-        incident_type = {'1': 'Facility Closure',
-                         '2': 'Layoff Event'}
         if 'Incident Type*' in df:
-            df['Incident Type'] = df['Incident Type'].apply(lambda x: incident_type.get(str(x), x))
+            df['Incident Type'] = df['Incident Type'].astype(str).map(MI_INCIDENT_TYPE).where(lambda s: s.notna(), df['Incident Type'])
 
         return df
 
@@ -574,98 +532,56 @@ class MNWARNSpider(WARNSpider):
     """Minnesota"""
     name = 'MNWARN'
 
-    custom_settings = {'DOWNLOAD_DELAY': 30.0}
-    PAUSE_AFTER = 5 # Requests
-    PAUSE_TIME = 5*60 # seconds
+    # One request at a time, at least 30s apart (AutoThrottle never goes below
+    # DOWNLOAD_DELAY), backing off further if the server slows down
+    custom_settings = {'DOWNLOAD_DELAY': 30.0,
+                       'AUTOTHROTTLE_ENABLED': True,
+                       'AUTOTHROTTLE_START_DELAY': 30.0,
+                       'AUTOTHROTTLE_MAX_DELAY': 60.0,
+                       'AUTOTHROTTLE_TARGET_CONCURRENCY': 1.0,
+                       'CONCURRENT_REQUESTS_PER_DOMAIN': 1}
 
     def parse(self, response):
         """This currently runs fine for about ~8 requests and then always runs into
         CAPTCHA codes.
         
-        Tried to use just default Scrapy request, requests.get, the PAUSE parameters
-        and updated DOWNLOAD_DELAY listed above, and finally Selenium instead, but 
-        none solved the problem..."""
-        
-        driver = self.initialize_webdriver()
-        driver.get(response.url)
-        
-        # Get links to only WARN notice archive PDF files 
-        links = self.get_links(response, find_in_href='.pdf')
-        terms = ['mass-layoff', 'plant-closing', 'dislocated-worker', 'warn']
-        links = [link for link in links if any((term in link.lower()) for term in terms)]
+        Tried to use just default Scrapy request, requests.get, pausing for 5 minutes
+        every 5 requests, a fixed 30s DOWNLOAD_DELAY, and finally Selenium instead, but 
+        none solved the problem...
 
-        # Iterate through links
-        base_url = get_base_url(response.url)
-        for link in links:
-            if not is_valid_url(link):
-                link = urljoin(base_url, link)
-
-            # Get PDF and save to file
-            driver.get(link)
-
-            # Save contents to file
-            timestamp = datetime.now()
-            name = link.split('/')[-1].splitext()[0]
-            saveFilename = f'{self.state_abbrev}_{timestamp.strftime("%Y%m%d%H%M%S")}_{name}.pdf'
-            saveFilepath = os.path.join(TMPDIR, saveFilename)
-            with open(os.path.join(TMPDIR, saveFilepath), "wb") as f:
-                f.write(driver.page_source)
-
-            # Parse request
-            df = todf.html(saveFilepath, **todf_kwargs)
-            df.to_csv(os.path.splitext(saveFilepath)[0] + "_parsed.csv")    
-
-            # Yield item
-            for index, row in df.iterrows():
-                fields = row.to_dict()
-                norm_fields = get_normalized_fields(self.fields_dict, row).to_dict()
-                item = Entry(state_name=self.state_name,
-                             timestamp=timestamp,
-                             url=response.url,
-                             fields=fields,
-                             normalized_fields=norm_fields)
-                yield item
-
-        driver.close()
+        The PDFs are static files, so they are requested directly and the
+        PDF bytes are parsed (no browser needed)."""
 
-        """
-        # Attempt to implement pause between every N requests
-        links = self.get_links(response, find_in_href='.pdf')
+        # Get links to only WARN notice archive PDF files 
+        links = list(dict.fromkeys(response.xpath(_MN_LINKS_XPATH).getall()))
 
         todf_kwargs = {'pdf_kwargs': {'flavor': 'stream',
                                       'row_tol': 13},
                        'header_row': 1}
-        cb_kwargs = {'todf_kwargs': todf_kwargs}
-        for i, link in enumerate(links):
-            if i % self.PAUSE_AFTER == 0 and i != 0:
-                logging.info(f"Sleeping for {self.PAUSE_TIME/60} minutes after {i} requests")
-                time.sleep(self.PAUSE_TIME)
-            yield response.follow(link, callback=self.parse_as_df, cb_kwargs=cb_kwargs)
-        """
+        cb_kwargs = {'parse_as': 'pdf',
+                     'todf_kwargs': todf_kwargs}
+        yield from response.follow_all(links, callback=self.parse_as_df, cb_kwargs=cb_kwargs)
 
 
 class MSWARNSpider(WARNSpider):
     """Mississippi"""
     name = 'MSWARN'
 
-    def parse(self, response):
-        link_kwargs = {'find_in_href': '.pdf',
-                       'exclude_from_href': 'map'}
-        yield from self.parse_links(response, link_kwargs=link_kwargs)
+    link_kwargs = {'find_in_href': '.pdf',
+                   'exclude_from_href': 'map'}
 
     def clean_df(self, df):
         """Number of employees gets read as a separate row from the rest of the notice: fix this"""
         
         # Rename original column and create new column to populate
         df.rename(columns={'Type of Action # Affected': 'Type of Action'}, inplace=True)
-        df['# Affected'] = ''
 
-        for index, row in df.iterrows():
-            if index > 0 and (pd.isnull(row['Company Name']) or row['Company Name'] == ''):
-                n_employees = row['Type of Action']
-                df.loc[index-1, ['# Affected']] = n_employees
-                df.loc[index, ['Type of Action']] = '' # This row will now be empty and deleted by default cleaning
-        
+        # Rows without a company name hold the number of employees for the row above
+        is_continuation = df['Company Name'].isna() | (df['Company Name'] == '')
+        is_continuation.iloc[:1] = False
+        df['# Affected'] = df['Type of Action'].where(is_continuation).shift(-1).fillna('')
+        df.loc[is_continuation, 'Type of Action'] = '' # These rows will now be empty and deleted by default cleaning
+
         return df
 
 
@@ -673,6 +589,8 @@ class MOWARNSpider(WARNSpider):
     """Missouri"""
     name = 'MOWARN'
 
+    START_YEAR = 2015 # Earliest data available online
+
     def __init__(self, *args, **kwargs):
         super(MOWARNSpider, self).__init__(*args, **kwargs)
         """MO has no index page for their archive, so this attempts to scrape
@@ -681,44 +599,44 @@ class MOWARNSpider(WARNSpider):
         
         TODO: also get 2020, which has different url: https://jobs.mo.gov/content/2020-missouri-warn-notices
         """
-        
-        base_url = re.sub('20\d\d', '', self.config_url)
-        start_year = 2015 # Earliest data available online
-        current_year = datetime.today().year
-        years = list(range(start_year, current_year + 1))
-        self.start_urls = [f'{base_url}{y}' for y in years]
-        print(self.start_urls)
+
+        self.start_urls = list(self.get_archive_urls(self.config_url, datetime.today().year))
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_archive_urls(cls, config_url, current_year):
+        """Generate the URL of each year's archive, from START_YEAR through current_year
+
+        Cached, since the URLs only change with the configured URL and the year.
+        """
+
+        base_url = _MO_YEAR_RE.sub('', config_url)
+        return tuple(f'{base_url}{y}' for y in range(cls.START_YEAR, current_year + 1))
 
 
 class MTWARNSpider(WARNSpider):
     """Montana"""
     name = 'MTWARN'
 
-    def parse(self, response):
-        link_kwargs = {'find_in_href': 'warn.xlsx'}
-        yield from self.parse_links(response, link_kwargs=link_kwargs)
+    link_kwargs = {'find_in_href': 'warn.xlsx'}
 
 
 class NEWARNSpider(WARNSpider):
     """Nebraska"""
     name = 'NEWARN'
 
-    def parse(self, response):
-        todf_kwargs = {'use_pandas': False,
-                       'link_col': 2}
-        yield from self.parse_as_df(response, todf_kwargs=todf_kwargs)
+    parse_kwargs = {'todf_kwargs': {'use_pandas': False,
+                                    'link_col': 2}}
 
 
 class NVWARNSpider(WARNSpider):
     """Nevada"""
     name = 'NVWARN'
 
-    def parse(self, response):
-        link_kwargs = {'find_in_href': '.pdf',
-                       'find_in_text': 'WARN'}
-        todf_kwargs = {'pdf_kwargs': {'flavor': 'stream'}, 
-                       'header_on_all_pages': False}
-        yield from self.parse_links(response, link_kwargs=link_kwargs, todf_kwargs=todf_kwargs)
+    link_kwargs = {'find_in_href': '.pdf',
+                   'find_in_text': 'WARN'}
+    parse_kwargs = {'todf_kwargs': {'pdf_kwargs': {'flavor': 'stream'},
+                                    'header_on_all_pages': False}}
 
 
 class NHWARNSpider(WARNSpider):
@@ -730,29 +648,23 @@ class NJWARNSpider(WARNSpider):
     """New Jersey"""
     name = 'NJWARN'
 
-    def parse(self, response):
-        """Use state-specific data-to-DataFrame defined in customtodf module"""
-        link_kwargs = {'find_in_text': 'Warn Notices'}
-        yield from self.parse_links(response, link_kwargs=link_kwargs,
-                                    custom_todf=ctodf.html_NJ)
+    # Use state-specific data-to-DataFrame defined in customtodf module
+    link_kwargs = {'find_in_text': 'Warn Notices'}
+    parse_kwargs = {'custom_todf': ctodf.html_NJ}
 
 
 class NMWARNSpider(WARNSpider):
     """New Mexico"""
     name = 'NMWARN'
 
-    def parse(self, response):
-        """Note that currently New Mexico's robots.txt does not allow scraping WARN notices.
-        This code can scrape the website, but in the future, should probably switch to
-        scraping from a directory of Excel sheets, which is what has been provided
-        """
-        
-        link_kwargs = {'find_in_href': '.pdf',
-                       'exclude_from_href': 'Handbook'}
-        todf_kwargs = {'pdf_kwargs': {'iterations': 2},
-                       'header_row': 1,
-                       'col_delimiter': '\n'}
-        yield from self.parse_links(response, link_kwargs=link_kwargs, todf_kwargs=todf_kwargs)
+    # Note that currently New Mexico's robots.txt does not allow scraping WARN notices.
+    # This code can scrape the website, but in the future, should probably switch to
+    # scraping from a directory of Excel sheets, which is what has been provided
+    link_kwargs = {'find_in_href': '.pdf',
+                   'exclude_from_href': 'Handbook'}
+    parse_kwargs = {'todf_kwargs': {'pdf_kwargs': {'iterations': 2},
+                                    'header_row': 1,
+                                    'col_delimiter': '\n'}}
 
 
 class NYWARNSpider(WARNSpider):
@@ -777,7 +689,7 @@ class NCWARNSpider(WARNSpider):
         pdf_kwargs = {'flavor': 'stream',
                       'columns': ['35,94,163,335,400,473']}
         for link in links:
-            if any([(year in link) for year in ['2015', '2016', '2017']]):
+            if _NC_2015_TO_2017_RE.search(link):
                 todf_kwargs = {'pdf_kwargs': pdf_kwargs,
                                'first_page_header': 1}
             elif '2014' in link:
@@ -792,11 +704,9 @@ class NDWARNSpider(WARNSpider):
     """North Dakota"""
     name = 'NDWARN'   
 
-    def parse(self, response):
-        todf_kwargs = {'pdf_kwargs': {'flavor': 'stream'},
-                       'header_on_all_pages': False,
-                       'header_row': 1}
-        yield from self.parse_as_df(response, todf_kwargs=todf_kwargs)
+    parse_kwargs = {'todf_kwargs': {'pdf_kwargs': {'flavor': 'stream'},
+                                    'header_on_all_pages': False,
+                                    'header_row': 1}}
 
 
 class OHWARNSpider(WARNSpider):
@@ -831,73 +741,41 @@ class ORWARNSpider(WARNSpider):
     """Oregon"""
     name = 'ORWARN'
 
+    # The generated Excel file is linked from the session that requested it
+    custom_settings = {'COOKIES_ENABLED': True}
+
     def parse(self, response):
-        """Run Selenium to generate and download Excel file
+        """Submit the form that generates the Excel file
 
         Note that to capture notice PDFs and notice date, would need to also scrape HTML version!
         """
 
-        driver = self.initialize_webdriver()
-        driver.get(response.url)
-        
-        # Generate .xlsx file
-        formatSelector = Select(driver.find_element_by_id('WARNFormat'))
-        formatSelector.select_by_value('xlsx')
-        driver.find_element_by_xpath('//input[@value="Create WARN List"]').click()
+        format_name = response.xpath('//select[@id="WARNFormat"]/@name').get('WARNFormat')
+        yield scrapy.FormRequest.from_response(response, formxpath='//select[@id="WARNFormat"]/ancestor::form',
+                                               formdata={format_name: 'xlsx'},
+                                               clickdata={'value': 'Create WARN List'},
+                                               callback=self.parse_generated)
 
-        try:
-             # Download .xlsx link once link appears to do so
-            wait = WebDriverWait(driver, 10)
-            downloadLink = wait.until(EC.presence_of_element_located((By.XPATH, '//a[contains(@href, ".xlsx")]')))
-            downloadLink.click()
-        except TimeoutException:
-            logging.error(f'Timed out waiting for link to download Excel file from {response.url}. Try again maybe?')
-        
-        saveFilepath = None
-        try:
-            # Wait for downloaded file to appear
-            r = re.compile('WARNList_\d{6}.xlsx')    
-            wait = WebDriverWait(driver, 15)
-            downloadFilename = wait.until(matching_file_in_directory(r, directory=TMPDIR))
-            downloadFilepath = os.path.join(TMPDIR, downloadFilename)
-
-            # Rename the file
-            timestamp = datetime.now()
-            saveFilename = f'{self.state_abbrev}_{timestamp.strftime("%Y%m%d%H%M%S")}_{downloadFilename}'
-            saveFilepath = os.path.join(TMPDIR, saveFilename)
-            os.rename(downloadFilepath, saveFilepath)
-        except (TimeoutError, IndexError):
-            logging.warning(f"Timed out waiting for, or couldn't find, downloaded Excel file from {response.url}. Disregard if link error appeard as well. Otherwise, check manually if a file was downloaded and see if the filename searched for needs updating.")
-
-        driver.close()
+    def parse_generated(self, response):
+        """Follow the link to the generated Excel file and parse it"""
 
-        # Parse DataFrames for each downloaded file and export Items to pipeline
-        # TODO: un-hardcode-this by splitting the method in WARNSpider into components and using some of those here
-        if saveFilepath:
-            todf_kwargs = {'skip_header': 2}
-            df = todf.excel(saveFilepath, **todf_kwargs)
-            df.to_csv(os.path.splitext(saveFilepath)[0] + "_parsed.csv")           
+        download_link = response.xpath('//a[contains(@href, ".xlsx")]/@href').get()
+        if download_link is None:
+            logging.error(f'No link to download Excel file from {response.url}. Try again maybe?')
+            return
 
-            for index, row in df.iterrows():
-                fields = row.to_dict()
-                norm_fields = get_normalized_fields(self.fields_dict, row).to_dict()
-                item = Entry(state_name=self.state_name,
-                             timestamp=timestamp,
-                             url=response.url,
-                             fields=fields,
-                             normalized_fields=norm_fields)
-                yield item
+        cb_kwargs = {'parse_as': 'excel',
+                     'todf_kwargs': {'skip_header': 2}}
+        yield response.follow(download_link, callback=self.parse_as_df, cb_kwargs=cb_kwargs)
 
 
 class PAWARNSpider(WARNSpider):
     """Pennsylvania"""
     name = 'PAWARN'
 
-    def parse(self, response):
-        """Use state-specific data-to-DataFrame defined in customtodf module"""
-        link_kwargs = {'find_in_href': 'warn/notices/Pages'}
-        yield from self.parse_links(response, link_kwargs=link_kwargs, 
-                                    custom_todf=ctodf.html_PA)
+    # Use state-specific data-to-DataFrame defined in customtodf module
+    link_kwargs = {'find_in_href': 'warn/notices/Pages'}
+    parse_kwargs = {'custom_todf': ctodf.html_PA}
 
 
 class RIWARNSpider(WARNSpider):
@@ -914,7 +792,7 @@ class SCWARNSpider(WARNSpider):
         #               'find_in_href': '.pdf'}
         links = self.get_links(response, find_in_text='Layoff Notifications', find_in_href='.pdf')
         for link in links:
-            if any([(year in link) for year in ['2010', '2011', '2012']]):
+            if _SC_2010_TO_2012_RE.search(link):
                 todf_kwargs = {'header_row': 1,
                                'header_on_all_pages': False}
             else:
@@ -928,10 +806,8 @@ class SDWARNSpider(WARNSpider):
     """South Dakota"""
     name = 'SDWARN'
 
-    def parse(self, response):
-        todf_kwargs = {'use_pandas': False,
-                       'link_col': 1}
-        yield from self.parse_as_df(response, todf_kwargs=todf_kwargs)
+    parse_kwargs = {'todf_kwargs': {'use_pandas': False,
+                                    'link_col': 1}}
 
 
 class TNWARNSpider(WARNSpider):
@@ -954,9 +830,7 @@ class TXWARNSpider(WARNSpider):
     """Texas"""
     name = 'TXWARN'
 
-    def parse(self, response):
-        link_kwargs = {'find_in_href': '.xls'}
-        yield from self.parse_links(response, link_kwargs=link_kwargs)
+    link_kwargs = {'find_in_href': '.xls'}
 
 
 class UTWARNSpider(WARNSpider):
@@ -973,10 +847,9 @@ class VAWARNSpider(WARNSpider):
     """Virginia"""
     name = 'VAWARN'
 
-    def parse(self, response):
-        link_kwargs = {'find_in_href': '.csv',
-                       'find_in_text': 'Download'}
-        yield from self.parse_links(response, format='csv', link_kwargs=link_kwargs)
+    link_kwargs = {'find_in_href': '.csv',
+                   'find_in_text': 'Download'}
+    parse_kwargs = {'format': 'csv'}
 
 
 class WAWARNSpider(WARNSpider):
@@ -990,51 +863,57 @@ class WAWARNSpider(WARNSpider):
     def parse(self, response):
         """Run Selenium to click through pages of HTML archive
         """
-        driver = self.initialize_webdriver()
+        # Imported here so that spiders that don't use Selenium don't need to load it
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
+        page_cells_locator = (By.XPATH, _WA_PAGE_CELLS_XPATH)
+        driver = self.get_driver()
         driver.get(response.url)
+        wait = self.get_wait(driver, 5)
+        wait.until(EC.presence_of_element_located(page_cells_locator))
 
-        todf_kwargs = {'drop_first_row': True}
+        # Only parse the table of notices (the one with the page number row)
+        todf_kwargs = {'drop_first_row': True,
+                       'table_xpath': _WA_NOTICES_TABLE_XPATH}
 
         # Parse first page
         yield from self.parse_page(driver, response, todf_kwargs=todf_kwargs)
 
         # While pages remain, click next page link and parse the resulting page
-        wait = WebDriverWait(driver, 5)
         nextPageElement = self.find_next_page_element(driver)
         while nextPageElement is not None:
             self.page_count += 1
             print(f"Following to page {self.page_count}")
             nextPageElement.click()
+            # Wait for the old page to go away and the new page's links to be rendered
             wait.until(EC.staleness_of(nextPageElement))
+            wait.until(EC.presence_of_element_located(page_cells_locator))
             nextPageElement = self.find_next_page_element(driver)
             yield from self.parse_page(driver, response, todf_kwargs=todf_kwargs)
             
         else:
             logging.info(f"Parsed {self.page_count} pages")  
 
-        driver.close()
-
     def parse_page(self, driver, response, todf_kwargs={}):
         """Parse the current page of the archive"""
         
         timestamp = datetime.now()
         saveFilename = f'{self.state_abbrev}_{timestamp.strftime("%Y%m%d%H%M%S")}_page{self.page_count}.html'
         saveFilepath = os.path.join(TMPDIR, saveFilename)
-        with open(os.path.join(TMPDIR, saveFilepath), "w") as f:
-            f.write(driver.page_source)
-
-        df = todf.html(saveFilepath, **todf_kwargs)
-        df.to_csv(os.path.splitext(saveFilepath)[0] + "_parsed.csv")    
-
-        for index, row in df.iterrows():
-            fields = row.to_dict()
-            norm_fields = get_normalized_fields(self.fields_dict, row).to_dict()
-            item = Entry(state_name=self.state_name,
-                            timestamp=timestamp,
-                            url=response.url,
-                            fields=fields,
-                            normalized_fields=norm_fields)
-            yield item
+        page_source = driver.page_source
+        self.save_intermediate_html(page_source, saveFilepath)
+
+        df = todf.html_from_string(page_source, **todf_kwargs)
+        csv_path = os.path.splitext(saveFilepath)[0] + "_parsed.csv"
+        self.save_intermediate_csv(df, csv_path)
+
+        try:
+            yield from self.get_items_from_df(df, response.url, timestamp)
+        except Exception:
+            # Keep the parsed page for troubleshooting
+            self.save_intermediate_csv(df, csv_path, force=True)
+            raise
 
     def find_next_page_element(self, driver):
         """Get the next active element after the current page element
@@ -1045,13 +924,15 @@ class WAWARNSpider(WARNSpider):
         the page numbers listed. When the final page is reached, there
         will be no more clickable elements after it."""
 
-        pageSection = driver.find_element_by_xpath('//tr[@style="color:#000066;background-color:#E6F2F9;"]')
-        pageRow = pageSection.find_element_by_xpath('.//tr')
-        pageElements = pageRow.find_elements_by_xpath('.//td')
-        currentPageIndex = [i for i, x in enumerate(pageElements) if not element_has_href(x)][0]
+        from selenium.webdriver.common.by import By
+
+        pageElements = driver.find_elements(By.XPATH, _WA_PAGE_CELLS_XPATH)
+        # Check all page elements for links in one call (the current page has none)
+        hasHref = driver.execute_script("return arguments[0].map(e => !!e.querySelector('[href]'));", pageElements)
+        currentPageIndex = hasHref.index(False)
 
         if currentPageIndex < len(pageElements) - 1:
-            return pageElements[currentPageIndex + 1].find_element_by_xpath('.//a')
+            return pageElements[currentPageIndex + 1].find_element(By.XPATH, './/a')
         else:
             return None
 
@@ -1071,48 +952,56 @@ class WIWARNSpider(WARNSpider):
     """Wisconsin"""
     name = 'WIWARN'
 
+    # Keep session cookies like a browser does (the landing page tables have been
+    # missing from responses downloaded without them)
+    custom_settings = {'COOKIES_ENABLED': True}
+
     def parse(self, response):
-        """Selenium"""
+        """Parse landing page and follow links to archived pages
+
+        Selenium is only used if the landing page downloaded by Scrapy has no tables.
+        """
         
         # Parse current data from landing pages
         todf_kwargs = {'use_pandas': False,
-                       'link_col': 1,
-                       'use_unicode': True}
+                       'link_col': 1}
         
-        # For some reason tables aren't showing up on the html page downloaded
+        if response.xpath('//table//td'):
+            yield from self.parse_as_df(response, parse_as='html', todf_kwargs=todf_kwargs)
+        else:
+            logging.info(f"No tables in landing page downloaded by Scrapy; using Selenium instead: {response.url}")
+            yield from self.parse_rendered(response, todf_kwargs=todf_kwargs)
+
+        # Follow links, parsing in same format
+        link_kwargs = {'find_in_text': 'Layoff Notice Information'}
+        yield from self.parse_links(response, link_kwargs=link_kwargs, todf_kwargs=todf_kwargs)
+
+    def parse_rendered(self, response, todf_kwargs={}):
+        """Parse landing page as rendered by Selenium"""
+
+        # For some reason tables haven't always shown up on the html page downloaded
         # by Scrapy, only for the landing page, so using Selenium here only
-        driver = self.initialize_webdriver()
+        driver = self.get_driver()
         driver.get(response.url)
         
-        # Save request to file
         timestamp = datetime.now()
         saveFilename = f'{self.state_abbrev}_{timestamp.strftime("%Y%m%d%H%M%S")}_.html'
         saveFilepath = os.path.join(TMPDIR, saveFilename)
-        with open(os.path.join(TMPDIR, saveFilepath), "w", encoding='utf-8') as f:
-            f.write(driver.page_source)
-
-        driver.close()
-
-        # Parse request
-        df = todf.html(saveFilepath, **todf_kwargs)
-        df.to_csv(os.path.splitext(saveFilepath)[0] + "_parsed.csv")    
+        page_source = driver.page_source
+        self.save_intermediate_html(page_source, saveFilepath)
 
-        # Yield item
-        for index, row in df.iterrows():
-            fields = row.to_dict()
-            norm_fields = get_normalized_fields(self.fields_dict, row).to_dict()
-            item = Entry(state_name=self.state_name,
-                            timestamp=timestamp,
-                            url=response.url,
-                            fields=fields,
-                            normalized_fields=norm_fields)
-            yield item
+        # Parse rendered page
+        df = todf.html_from_string(page_source, **todf_kwargs)
+        csv_path = os.path.splitext(saveFilepath)[0] + "_parsed.csv"
+        self.save_intermediate_csv(df, csv_path)
 
-        #yield from self.parse_as_df(response, todf_kwargs=todf_kwargs)
-
-        # Follow links, parsing in same format
-        link_kwargs = {'find_in_text': 'Layoff Notice Information'}
-        yield from self.parse_links(response, link_kwargs=link_kwargs, todf_kwargs=todf_kwargs)
+        # Yield items
+        try:
+            yield from self.get_items_from_df(df, response.url, timestamp)
+        except Exception:
+            # Keep the parsed page for troubleshooting
+            self.save_intermediate_csv(df, csv_path, force=True)
+            raise
 
 
 class WYWARNSpider(WARNSpider):
@@ -1123,61 +1012,6 @@ class WYWARNSpider(WARNSpider):
 # =============================================================================
 # Helper functions for Selenium-based scraping
 # =============================================================================  
-class file_exists(object):
-    """Selenium wait condition: has the file been downloaded (does it exist)?
-    TODO: put this somewhere else!"""
-    
-    def __init__(self, filepath):
-        self.filepath = filepath
-
-    def __call__(self, driver):
-        if os.path.isfile(self.filepath):
-            return True
-        else:
-            return False    
-
-
-class matching_file_in_directory(object):
-    """Selenium wait condition: does a file matching a regular expression exist
-    in the given directory (or CWD if no directory provided)?
-
-    Returns file with "largest" value (should be the newest) if multiple exist
-
-    TODO: put this somewhere else!"""
-    
-    def __init__(self, r, directory=''):
-        """r: compiled regular expression"""
-        self.r = r
-        self.directory = directory 
-
-    def __call__(self, driver):
-        fileList = os.listdir(self.directory)
-        matchingFiles = list(filter(self.r.match, fileList))
-        if len(matchingFiles) > 0:
-            matchingFiles.sort(reverse=True)
-            return matchingFiles[0]
-        else:
-            return False   
-
-
-class find_next_page_element(object):
-    """Selenium wait condition: Return next page element to click, or None if none exists
-    TODO: put this somewhere else!"""
-
-    def __call__(self, driver):
-        pageSection = driver.find_element_by_xpath('//tr[@style="color:#000066;background-color:#E6F2F9;"]')
-        pageRow = pageSection.find_element_by_xpath('.//tr')
-        pageElements = pageRow.find_elements_by_xpath('.//td')
-        print(pageElements.text)
-        currentPageIndex = [i for i, x in enumerate(pageElements) if x.get_attribute('href') is None][0]
-
-        if currentPageIndex < len(pageElements) - 1:
-            nextPageElement = pageRow.find_element_by_xpath(f'.//td[{currentPageIndex + 1}]')
-            return nextPageElement
-        else:
-            return False
-
-
 class text_has_changed(object):
     """Selenium wait condition: Check if element text has changed
     TODO: put this somewhere else!"""
@@ -1191,24 +1025,3 @@ class text_has_changed(object):
         element = driver.find_element(*self.locator)
         return (element.text != self.original_text)
 
-
-class element_to_not_be_clickable(object):
-    """ An Expectation for checking an element is not enabled such that
-    you cannnot click it."""
-    def __init__(self, locator):
-        self.locator = locator
-
-    def __call__(self, driver):
-        element = visibility_of_element_located(self.locator)(driver)
-        if element and not(element.is_enabled()):
-            return element
-        else:
-            return False
-
-def element_has_href(element):
-    """Check if an element (or child of an element) has href without raising exception"""
-    try:
-        element = element.find_element_by_xpath('.//*[@href]')
-        return True
-    except NoSuchElementException:
-        return False
\ No newline at end of file
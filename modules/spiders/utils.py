@@ -2,8 +2,12 @@
 
 from modules.spiders import states
 
+# Spider class for each two-letter state abbreviation, e.g. SPIDERS['AL'] is ALWARNSpider
+SPIDERS = {name[:-len('WARNSpider')]: cls for name, cls in vars(states).items()
+           if isinstance(cls, type) and name.endswith('WARNSpider') and name != 'WARNSpider'}
+
 
 def get_spider(state):
     """Return Spider class corresponding to two-letter state abbreviation"""
     
-    return getattr(states, f'{state}WARNSpider')
\ No newline at end of file
+    return SPIDERS[state]
@@ -2,23 +2,59 @@
 
 import os
 import re
+import copy
+import time
 import logging
+import threading
 import yaml
-import xlrd
 import openpyxl
+import pandas as pd
 from urllib.parse import urlparse, urlunparse
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+from lxml import etree
+
+# Optional: watch for downloaded files with filesystem events instead of polling
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
 
 MONTHS = ['January', 'February', 'March', 'April', 'May', 'June',
           'July', 'August', 'September', 'October', 'November', 'December']
 MONTHS_DICT = {i+1: x for (i, x) in enumerate(MONTHS)}
 
+# Text recognized by to_bool
+_TRUE_STRINGS = frozenset({'yes', 'y', 'true', 't'})
+_FALSE_STRINGS = frozenset({'no', 'n', 'false', 'f'})
+_NONE_STRINGS = frozenset({'', 'nan', 'none'})
+
+_XP_STRING = etree.XPath('string(.)')
+
+# Serial number of 12/31/9999, the last date Excel can represent
+_EXCEL_MAX_SERIAL_DATE = 2958466
+
+# Extensions of files that browsers are still downloading (renamed once finished)
+_PARTIAL_DOWNLOAD_EXTS = ('.crdownload', '.part', '.tmp')
+
+# Seconds by which file modification times may be rounded down (e.g., 2 on FAT)
+_MTIME_RESOLUTION = 2
+
 # =============================================================================
 # File import/export and naming
 # =============================================================================
 def import_yaml(path):
-    """Import a YAML configuration file as dictionary"""
+    """Import a YAML configuration file as dictionary
+
+    Each file is only parsed once; callers get their own copy of the result.
+    """
+    return copy.deepcopy(_load_yaml(os.path.abspath(path)))
+
+
+@lru_cache(maxsize=None)
+def _load_yaml(path):
     with open(path, 'r') as stream:
         try:
             d = yaml.safe_load(stream)
@@ -28,17 +64,90 @@ def import_yaml(path):
             return None
 
 
+def wait_for_file(directory, pattern, timeout, since=None):
+    """Wait for a file whose name matches pattern to appear in directory
+
+    Uses filesystem events from watchdog if it is installed, and otherwise
+    checks the directory every half second. Files that are moved into place
+    (e.g., when Chrome renames a finished .crdownload file) also count, but
+    files still being downloaded (e.g., .crdownload) don't.
+
+    Parameters:
+        directory: directory in which the file is expected
+        pattern: compiled regular expression matched against the whole file name
+        timeout: maximum number of seconds to wait
+        since: ignore files already in the directory that were last modified before
+               this time (as from time.time()); by default, the time of the call
+
+    Returns:
+        name of the matching file (the one that sorts last, if there are several
+        already), or None if none appeared in time
+    """
+
+    if since is None:
+        since = time.time()
+
+    def is_match(name):
+        return pattern.fullmatch(name) is not None and not name.endswith(_PARTIAL_DOWNLOAD_EXTS)
+
+    def find_existing():
+        with os.scandir(directory) as entries:
+            return max((e.name for e in entries
+                        if is_match(e.name) and e.stat().st_mtime >= since - _MTIME_RESOLUTION),
+                       default=None)
+
+    if Observer is None:
+        deadline = time.monotonic() + timeout
+        while True:
+            name = find_existing()
+            if name is not None or time.monotonic() >= deadline:
+                return name
+            time.sleep(0.5)
+
+    found = []
+    event_found = threading.Event()
+
+    class Handler(FileSystemEventHandler):
+        def check(self, path):
+            name = os.path.basename(path)
+            if is_match(name):
+                found.append(name)
+                event_found.set()
+
+        def on_created(self, event):
+            if not event.is_directory:
+                self.check(event.src_path)
+
+        def on_moved(self, event):
+            if not event.is_directory:
+                self.check(event.dest_path)
+
+    observer = Observer()
+    observer.schedule(Handler(), directory, recursive=False)
+    observer.start()
+    try:
+        # The file may have been written before the observer started
+        name = find_existing()
+        if name is None and event_found.wait(timeout):
+            name = found[0]
+    finally:
+        observer.stop()
+        observer.join()
+
+    return name
+
+
 # =============================================================================
 # String cleaning
 # =============================================================================
 def to_bool(x):
     """Return True if truthy text, False if falsy text, and None otherwise"""
     s = str(x).lower()
-    if s in ['yes', 'y', 'true', 't']:
+    if s in _TRUE_STRINGS:
         return True
-    elif s in ['no', 'n', 'false', 'f']:
+    elif s in _FALSE_STRINGS:
         return False
-    elif s in ['', 'nan', 'none']:
+    elif s in _NONE_STRINGS:
         return None
     else:
         logging.warning(f"Could not convert {x} to bool")
@@ -62,6 +171,12 @@ def remove_reserved_chars(s):
 # =============================================================================
 # HTML wrangling
 # =============================================================================
+@lru_cache(maxsize=None)
+def _get_xpath(xpath_str):
+    """Compile an XPath expression once for reuse"""
+    return etree.XPath(xpath_str)
+
+
 def get_text_of_matching_elements(html, xpath_str, re_str=''):
     """Scrape list of cleaned strings from tabular HTML block.
 
@@ -89,13 +204,19 @@ def get_text_of_matching_elements_lxml(html, xpath_str, re_str=''):
     
     Parameters:
         html: part or all of HTML response
-        xpath_str: xpath selector string that may be relative to the given HTML
-        remove: string specifying any characters that should be substituted with ''
+        xpath_str: xpath selector string that may be relative to the given HTML,
+                   or precompiled etree.XPath
+        remove: string specifying any characters that should be substituted with '',
+                or precompiled regular expression
     """
 
-    data = html.xpath(xpath_str)
-    data = [d.xpath('string(.)') for d in data]
-    data = [re.sub(re_str, '', d).strip() for d in data]     
+    if not isinstance(xpath_str, etree.XPath):
+        xpath_str = _get_xpath(xpath_str)
+    data = [_XP_STRING(d) for d in xpath_str(html)]
+    if re_str:
+        data = [re.sub(re_str, '', d).strip() for d in data]
+    else:
+        data = [d.strip() for d in data]
     
     return data
 
@@ -145,37 +266,47 @@ def get_base_url(x):
 # =============================================================================
 # Excel wrangling
 # =============================================================================
+def load_xls(filename):
+    """Read every sheet of an old-style Excel (.xls) file as a DataFrame of cell values
+
+    The first row of each sheet is treated as column names only to find date columns:
+    values in columns whose name contains 'date' are converted to mm/dd/yyyy strings,
+    including dates stored as plain Excel serial numbers.
+
+    Returns:
+        dict of sheet_name: DataFrame (with the first row kept as data, i.e. header=None)
+    """
+
+    # Keep text such as 'n/a' as is; empty cells are read as ''
+    sheets = pd.read_excel(filename, sheet_name=None, header=None, engine='xlrd', keep_default_na=False)
+
+    for df in sheets.values():
+        if len(df) < 2:
+            continue
+        date_cols = [col for col in df.columns if 'date' in str(df.at[0, col]).lower()]
+        for col in date_cols:
+            values = df[col].iloc[1:]
+            df[col] = df[col].astype(object)
+
+            # Cells formatted as dates are already read as datetimes
+            is_datetime = values.map(lambda v: isinstance(v, datetime))
+            df.loc[values.index[is_datetime], col] = [v.strftime("%m/%d/%Y") for v in values[is_datetime]]
+
+            # Other numbers are Excel serial dates (days since 1899-12-30)
+            days = pd.to_numeric(values[~is_datetime], errors='coerce')
+            days = days[(days >= 0) & (days < _EXCEL_MAX_SERIAL_DATE)].astype('int64')
+            dates = pd.to_datetime(days, unit='D', origin='1899-12-30')
+            df.loc[dates.index, col] = dates.dt.strftime("%m/%d/%Y")
+
+    return sheets
+
+
 def load_xls_as_xlsx(filename):
-    """Convert xls file to openpyxl xlsx workbook"""
-
-    wb_old = xlrd.open_workbook(filename)
-    wb_new =  openpyxl.Workbook()
-
-    for i in range(wb_old.nsheets):
-        sheet_old = wb_old.sheet_by_index(i)
-        name = wb_old.sheet_names()[i]
-        if i == 0:
-            sheet_new = wb_new.active
-            sheet_new.title = name
-        else:
-            sheet_new = wb_new.create_sheet(name)
-
-        col_names = []
-        for row in range(sheet_old.nrows):
-            for col in range(sheet_old.ncols):
-                value = sheet_old.cell_value(row, col)
-                if row == 0:
-                    col_names.append(str(value).lower())
-                else:
-                    # xlrd imports dates as integers; try to convert to datetime
-                    if 'date' in col_names[col]:
-                        try:
-                            d = xlrd.xldate_as_datetime(int(value), wb_old.datemode)
-                            value = d.strftime("%m/%d/%Y")
-                        except ValueError:
-                            pass
-                sheet_new.cell(row=row+1, column=col+1).value = value
-
-    wb_new.save(filename=filename+'x')
-
-    return wb_new
+    """Convert xls file to an xlsx file saved alongside it (filename + 'x'), for callers needing openpyxl"""
+
+    xlsx_filename = filename + 'x'
+    with pd.ExcelWriter(xlsx_filename, engine='openpyxl') as writer:
+        for name, df in load_xls(filename).items():
+            df.to_excel(writer, sheet_name=name, header=False, index=False)
+
+    return openpyxl.load_workbook(xlsx_filename)
@@ -7,7 +7,7 @@ import logging
 from scrapy.crawler import CrawlerProcess
 from scrapy.settings import Settings
 
-from config import CONFIG
+from config import CONFIG, TMPDIR
 from modules.spiders.utils import get_spider
 
 #Set Logging out to a text file
@@ -61,7 +61,22 @@ def initialize_process():
                          'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36', # This is my actual user agent when using a browser
                          'COOKIES_ENABLED': False,
                          'ROBOTSTXT_OBEY': True,
-                         'DOWNLOAD_DELAY': 5.0,
+                         # Adapt the delay to each server's response times instead of a fixed DOWNLOAD_DELAY;
+                         # each state is its own domain, so states are crawled in parallel
+                         'AUTOTHROTTLE_ENABLED': True,
+                         'AUTOTHROTTLE_START_DELAY': 1.0,
+                         'AUTOTHROTTLE_MAX_DELAY': 10.0,
+                         'AUTOTHROTTLE_TARGET_CONCURRENCY': 4.0,
+                         'CONCURRENT_REQUESTS': 32,
+                         'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+                         'DOWNLOAD_TIMEOUT': 30,
+                         'WARN_SAVE_INTERMEDIATE': False, # Set to True to save parsed/cleaned CSVs for debugging
+                         'WARN_PARSE_CACHE': False, # Set to True to reuse DataFrames parsed from identical responses
+                         # Cache responses, revalidating them with the server (Last-Modified/ETag) on later runs
+                         'HTTPCACHE_ENABLED': True,
+                         'HTTPCACHE_POLICY': 'scrapy.extensions.httpcache.RFC2616Policy',
+                         'HTTPCACHE_STORAGE': 'scrapy.extensions.httpcache.FilesystemCacheStorage',
+                         'HTTPCACHE_DIR': os.path.join(TMPDIR, 'httpcache'),
                          'DEFAULT_REQUEST_HEADERS': {
                              'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
                              'Accept-Language': 'en',